@@ -3,27 +3,123 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
 import warnings
+from functools import partial
+from superstore import analytics, charts, etl, profiling
+from superstore.aggregate import DATE_PANELS
+from superstore.backend import FrameBackend
+from superstore.cache import make_key, panel_results
+from superstore.cube import LINES
+from superstore.export import available_formats, deferred, deferred_zip, file_name, mime
+from superstore.ingest import DEFAULT_CHUNK_ROWS, STREAM_THRESHOLD_BYTES
+from superstore.loader import DATA_DIR, data_file, derived, load_path, load_upload, release_inactive, release_session
+from superstore.pages import DEFAULT_PAGE_SIZE, PAGE_SIZES, page_count
+from superstore.sql import (DEFAULT_TABLE, PREVIEW_ROWS, can_stream, is_database, open_database, save_upload,
+                            stream_path, stream_summary, stream_upload)
 warnings.filterwarnings("ignore")
 
 # set title
 st.set_page_config(page_title="SuperStore Sales Dashboard",page_icon=":bar_chart:",layout="wide")
 st.title(" :bar_chart:  SuperStore Analysis")
 
+# per-stage timing of this rerun; off unless the debug toggle at the bottom of
+# the sidebar is on or metrics are exported (see superstore.profiling)
+debug=st.session_state.get("debug_profile", profiling.ENABLED_BY_DEFAULT)
+profiler=profiling.activate(profiling.Profiler(enabled=debug or profiling.exporting()))
+stage=profiling.stage
+
 
 # file upload
-uploaded_file=st.file_uploader("Upload Super Store Dataset",type=['csv','xlsx','xlx','SQL'])
-if uploaded_file is not None:
-    if uploaded_file.name.endswith('.csv'):
-        df = pd.read_csv(uploaded_file,encoding= 'ISO-8859-1')
-    elif uploaded_file.name.endswith('.xlsx'):
-        df = pd.read_excel(uploaded_file)
-    else:
-        st.error("Unsupported file format. Please upload a CSV or Excel file.")
-else:
-    # Load the dataset from a CSV file
-    df = pd.read_csv("/Users/muhammadusama/Desktop/portfolio/cleaned_superstore.csv",encoding= 'ISO-8859-1')
+uploaded_file=st.file_uploader("Upload Super Store Dataset",type=['csv','xlsx','xlx','SQL','db','duckdb','sqlite'])
+
+# sidebar dropdown for data overview
+st.sidebar.header("📌 Select What to View")
+option=st.sidebar.selectbox("Choose an option:",
+        ("About Data","Show Dataset", "Show Columns","Show Data Types", "Show Null Values", "Show Summary Statistics", "Show Correlation Matrix")
+    )
+
+# large CSV files are streamed in fixed-size chunks into a DuckDB file that is
+# queried in place, or into the columnar cache when duckdb is not installed
+st.sidebar.header("📂 Large Files")
+# files on the server's disk are only offered from the data directory it allows
+local_path=None
+if DATA_DIR:
+    local_path=st.sidebar.text_input("Local CSV path", help=f"Stream a CSV file from {DATA_DIR} on the server instead of uploading it")
+chunk_rows=st.sidebar.number_input("Chunk size (rows)", min_value=1000, value=DEFAULT_CHUNK_ROWS, step=10000,
+                                   help="Rows parsed at a time while streaming; caps peak memory during ingest")
+
+# a database is queried in place: filters and groupbys run inside it
+st.sidebar.header("🗄️ Database")
+database_path=None
+if DATA_DIR:
+    database_path=st.sidebar.text_input("Local database path", help=f"Query a DuckDB or SQLite database file in {DATA_DIR} instead of loading the data")
+table_name=st.sidebar.text_input("Table", value=DEFAULT_TABLE)
+
+progress_bar=None
+def show_progress(fraction, text):
+    global progress_bar
+    if progress_bar is None:
+        progress_bar=st.progress(0.0)
+    progress_bar.progress(fraction, text=text)
+
+# the loader caches the parsed, typed frame, so reruns don't re-read the file.
+# it is shared by every session of this server process: each session gets a
+# copy-on-write view of it and holds it until the session loads another
+# dataset or ends, when the shared frame can be dropped. every view option
+# uses the same frame with all columns; the row-level tables show only the
+# columns the panels need (see FrameBackend.row_columns).
+ctx=get_script_run_ctx()
+session_id=ctx.session_id if ctx is not None else None
+if Runtime.exists():
+    release_inactive(Runtime.instance().is_active_session)
+
+# large uploads are streamed, smaller ones are parsed in one piece
+streamed = local_path or (uploaded_file is not None and uploaded_file.size > STREAM_THRESHOLD_BYTES)
+
+with stage("load") as record:
+    backend = None
+    try:
+        if database_path or (uploaded_file is not None and is_database(uploaded_file.name)):
+            release_session(session_id)
+            database = data_file(database_path) if database_path else save_upload(uploaded_file)
+            backend = open_database(database, table_name)
+            df = backend.frame
+            st.caption(f"Querying table `{table_name}` in `{database}`. The data overview options other than Show Dataset use its first {PREVIEW_ROWS:,} rows.")
+        elif streamed and can_stream(local_path or uploaded_file.name):
+            release_session(session_id)
+            if local_path:
+                backend = stream_path(data_file(local_path), chunk_rows, show_progress)
+            else:
+                backend = stream_upload(uploaded_file, chunk_rows, show_progress)
+            df = backend.frame
+            st.caption(f"Querying the streamed file in place. The data overview options other than Show Dataset use its first {PREVIEW_ROWS:,} rows.")
+        elif local_path:
+            df = load_path(data_file(local_path), chunk_rows=chunk_rows, progress=show_progress, session=session_id)
+        elif uploaded_file is not None:
+            stream_rows = chunk_rows if streamed else None
+            df = load_upload(uploaded_file, chunk_rows=stream_rows, progress=show_progress, session=session_id)
+        elif os.path.exists(etl.RAW_DATASET):
+            # the bundled raw export, cleaned incrementally into its columnar store
+            df = etl.load(session=session_id)
+        else:
+            # Load the dataset from the CSV file bundled with the dashboard
+            df = load_path(session=session_id)
+        if backend is None:
+            backend = FrameBackend(df)
+    except (ValueError, OSError) as exc:
+        st.error(str(exc))
+        st.stop()
+    record.rows_out = len(df)
+
+if progress_bar is not None:
+    progress_bar.empty()
+summary=derived(df, "ingest_summary", lambda: None) if isinstance(backend, FrameBackend) else stream_summary(backend)
+if summary is not None:
+    st.caption(f"Streamed {summary.rows:,} rows in chunks of {chunk_rows:,}: "
+               f"sales ${summary.sales:,.0f}, profit ${summary.profit:,.0f}, {summary.orders:,} orders.")
 
 st.markdown("""
 ### 📊 Dashboard Overview
@@ -42,65 +138,79 @@ The dashboard is built using **Streamlit** and **Plotly**, offering clean visual
 """)
 
 
-# KPIs
-col1, col2, col3 = st.columns(3)
-col1.metric("📈 Total Sales", f"${df['Sales'].sum():,.0f}")
-col2.metric("💰 Total Profit", f"${df['Profit'].sum():,.0f}")
-col3.metric("📦 Total Orders", df['Order ID'].nunique())
-
-
-
-
-# sidebar dropdown for data overview
-st.sidebar.header("📌 Select What to View")
-option=st.sidebar.selectbox("Choose an option:",
-        ("About Data","Show Dataset", "Show Columns","Show Data Types", "Show Null Values", "Show Summary Statistics", "Show Correlation Matrix")
-    )
-
-# Show dataset
-if option== "Show Dataset":
-    st.subheader("Dataset Overview")
-    st.write("This dataset contains information about Super Store Sales, including customer, product details, Profit details, Discount details, Delivery details, sales data and many other things about sales.")
-    st.write(df)
-# Show columns
-elif option == "Show Columns":
-        st.subheader("Columns in the Dataset")
-        st.write("The dataset includes the following columns:")
-        st.write(df.columns.tolist())
-    # Show data types
-elif option == "Show Data Types":
-        st.subheader("Data Types of Each Column")
-        st.write("This section provides the data types of each column in the dataset.")
-        st.write(df.dtypes)
-    # Show null values
-elif option == "Show Null Values":
-        st.subheader("Null Values Overview")
-        st.write("This section shows the number of null values in each column of the dataset.")
-        st.write(df.isnull().sum())
-    # Show summary statistics
-elif option == "Show Summary Statistics":
-        st.subheader("Summary Statistics")
-        st.write("This section provides a summary of the dataset, including mean, median, standard deviation, and other statistics for each numerical column.")
-        st.write(df.describe())
-    # Show correlation matrix
-elif option == "Show Correlation Matrix":
-        st.subheader("Correlation Matrix")
-        st.write("This section shows the correlation matrix of the numerical columns in the dataset.")
-        numeric_df = df.select_dtypes(include='number')
-        corr = numeric_df.corr()
-        fig = px.imshow(corr, text_auto=True, aspect="auto", color_continuous_scale='RdBu')
-        st.plotly_chart(fig, use_container_width=True)
-
+# KPIs, filled in once the date window is known
+kpi1, kpi2, kpi3 = st.columns(3)
+
+
+
+
+# tables of order lines are paginated server-side: sorting, column choice and
+# search run over the whole row set, and only the visible page is sent
+def show_page(pager, key, columns=None):
+    search_col, sort_col, order_col, size_col=st.columns([3, 2, 1, 1])
+    search=search_col.text_input("Search", key=f"{key}_search", placeholder="Text in any shown column")
+    sort_by=sort_col.selectbox("Sort by", [None] + pager.columns, key=f"{key}_sort",
+                               format_func=lambda column: "Original order" if column is None else column)
+    ascending=order_col.toggle("Ascending", value=True, key=f"{key}_ascending")
+    size=size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f"{key}_size")
+    shown=st.multiselect("Columns", pager.columns, default=columns or pager.columns, key=f"{key}_columns") or pager.columns
+
+    total=pager.count(search, shown)
+    pages=page_count(total, size)
+    # keep the page number in range when a search or a filter shrinks the rows
+    st.session_state.setdefault(f"{key}_page", 1)
+    st.session_state[f"{key}_page"]=min(st.session_state[f"{key}_page"], pages)
+    number=st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    st.dataframe(pager.page(number - 1, size, shown, sort_by, ascending, search), hide_index=True)
+    first=(number - 1) * size
+    st.caption(f"Rows {min(first + 1, total):,}–{min(first + size, total):,} of {total:,}")
+
+
+with stage(f"overview: {option}"):
+    # Show dataset
+    if option== "Show Dataset":
+        st.subheader("Dataset Overview")
+        st.write("This dataset contains information about Super Store Sales, including customer, product details, Profit details, Discount details, Delivery details, sales data and many other things about sales.")
+        show_page(backend.pager(), "dataset")
+    # Show columns
+    elif option == "Show Columns":
+            st.subheader("Columns in the Dataset")
+            st.write("The dataset includes the following columns:")
+            st.write(df.columns.tolist())
+        # Show data types
+    elif option == "Show Data Types":
+            st.subheader("Data Types of Each Column")
+            st.write("This section provides the data types of each column in the dataset.")
+            st.write(df.dtypes)
+        # Show null values
+    elif option == "Show Null Values":
+            st.subheader("Null Values Overview")
+            st.write("This section shows the number of null values in each column of the dataset.")
+            st.write(df.isnull().sum())
+        # Show summary statistics
+    elif option == "Show Summary Statistics":
+            st.subheader("Summary Statistics")
+            st.write("This section provides a summary of the dataset, including mean, median, standard deviation, and other statistics for each numerical column.")
+            st.write(df.describe())
+        # Show correlation matrix
+    elif option == "Show Correlation Matrix":
+            st.subheader("Correlation Matrix")
+            st.write("This section shows the correlation matrix of the numerical columns in the dataset.")
+            def correlation_matrix():
+                numeric_df = df.select_dtypes(include='number')
+                corr = numeric_df.corr()
+                return px.imshow(corr, text_auto=True, aspect="auto", color_continuous_scale='RdBu')
+            fig = charts.cached("correlation", make_key(backend.key, df.columns.tolist()), correlation_matrix)
+            st.plotly_chart(fig, use_container_width=True)
+
+# every query below goes through the backend: the in-memory frame with its
+# date index, filter index and sales cube, or a database queried in place
 col1, col2=st.columns((2))
-# Step 1: Clean any extra whitespace
-df['Order Date'] = df['Order Date'].astype(str).str.strip()
-
-# Step 2: Convert using correct US-style format (MM/DD/YYYY)
-df['Order Date'] = pd.to_datetime(df['Order Date'], errors='coerce', dayfirst=False)
-
+# Order Date is already cleaned, parsed and sorted by the loader
 #getting min max date
-StartDate=pd.to_datetime(df["Order Date"]).min()
-EndDate=pd.to_datetime(df["Order Date"]).max()
+with stage("date bounds"):
+    StartDate=backend.first
+    EndDate=backend.last
 
 with col1:
     date1=pd.to_datetime(st.date_input('Start Date', StartDate))
@@ -108,301 +218,408 @@ with col1:
 with col2:
     date2=pd.to_datetime(st.date_input('End Date', EndDate))
 
-df=df[(df["Order Date"]>=date1) & (df["Order Date"]<=date2)].copy()
+with stage("kpis") as record:
+    totals=backend.totals(date1, date2)
+    record.rows_in=totals['Lines']
+kpi1.metric("📈 Total Sales", f"${totals['Sales']:,.0f}")
+kpi2.metric("💰 Total Profit", f"${totals['Profit']:,.0f}")
+kpi3.metric("📦 Total Orders", totals['Orders'])
 
 # Sidebar for region city and state
 st.sidebar.header("Select Your filter: ")
-# for region
-Region=st.sidebar.multiselect("Select Region", df["Region"].unique())
-if not Region:
-    df2=df.copy()
-else:
-    df2=df[df["Region"].isin(Region)]
-
-# for state
-state=st.sidebar.multiselect("Select State", df2["State"].unique())
-if not state:
-    df3=df2.copy()
-else:
-    df3=df2[df2["State"].isin(state)]
-# for city
-city=st.sidebar.multiselect("Select City", df3["City"].unique())
+# each list only offers the values present under the selections above it
+with stage("filter options"):
+    Region=st.sidebar.multiselect("Select Region", backend.options("Region", date1, date2))
+    state=st.sidebar.multiselect("Select State", backend.options("State", date1, date2, {"Region": Region}))
+    city=st.sidebar.multiselect("Select City", backend.options("City", date1, date2, {"Region": Region, "State": state}))
 
 # filter the data based on Region State and city
-
-if not Region and not state and not city:
-    filtered_df=df
-elif not state and not city:
-    filtered_df=df[df["Region"].isin(Region)]
-elif not Region and not city:
-    filtered_df=df[df['State'].isin(state)]
-elif  state and  city:
-    filtered_df=df3[df["State"].isin(state) & df3["City"].isin(city)]
-elif  Region and  city:
-    filtered_df=df3[df["Region"].isin(Region) & df3["City"].isin(city)]
-elif  state and  Region:
-    filtered_df=df3[df["State"].isin(state) & df3["Region"].isin(Region)]
-elif city:
-    filtered_df=df3[df3["City"].isin(city)]
-else:
-    filtered_df=df3[df3["Region"].isin(Region) & df3["State"].isin(state) & df3["City"].isin(city)]
-category_df=filtered_df.groupby(by=["Category","Sub-Category"], as_index=False)["Sales"].sum()
-
-with col1:
-    st.subheader("Category wise Sales")
-    fig=px.bar(category_df,
-               x="Category",
-               y="Sales",
-               color="Category",
-               template="seaborn",
-               )
-    st.plotly_chart(fig,
-                     use_container=True,
-                     height=200)
-    
-    with col2:
-        st.subheader("Region wise Sales")
-        fig=px.pie(filtered_df,
-                    names="Region",
-                    values="Sales",
-                    hole=0.5)
+selections={"Region": Region, "State": state, "City": city}
+# order lines of the filtered data, as a frame or paginated; each row-level
+# section adds its own conditions
+filtered_rows=partial(backend.rows, date1, date2, selections)
+filtered_pager=partial(backend.pager, date1, date2, selections)
+# identifies the dataset and filter state that the cached section results belong to
+filter_key=make_key(backend.key, date1, date2, selections)
+
+# every panel table comes from one aggregation pass, with and without the Region/State/City filters
+with stage("panels") as record:
+    panels=backend.panels(date1, date2, selections)
+    # the ship mode line counts add up to the filtered order lines
+    record.rows_in=int(panels["ship_mode"][LINES].sum())
+    record.rows_out=sum(len(table) for table in panels.tables.values())
+with stage("date panels", totals['Lines']) as record:
+    date_panels=backend.panels(date1, date2, panels=DATE_PANELS)
+    record.rows_out=sum(len(table) for table in date_panels.tables.values())
+
+# row-level conditions of the loss sections
+HIGH_DISCOUNT_LOSS=[("Discount", ">", 0.3), ("Profit", "<", 0)]
+SELLING_WELL_LOSS=[("Sales", ">", 1000), ("Profit", "<", 0)]
+
+# downloads: format for every Download button, plus one ZIP with all panel tables
+export_format=st.sidebar.selectbox("Download format", available_formats())
+st.sidebar.download_button("⬇️ Download all tables",
+                           deferred_zip("all_tables", filter_key, export_format, {
+                               "category": panels["category"],
+                               "Region": panels["region"],
+                               "Discount": panels["discount"],
+                               "Sub_Category": panels["sub_category"],
+                               "Ship_Mode": panels["ship_mode"],
+                               "Customer_Segment_Analysis": panels["segment"],
+                               "State_City_Profit": panels["state_city"],
+                               "Hierarchical_Sales": panels["hierarchy"],
+                               "Top_States": date_panels["state"],
+                               "Top_Cities": date_panels["city"],
+                               # row-level tables are only queried when the ZIP is built;
+                               # filtered_rows is bound to this rerun's filters
+                               "High_Discount_Losses": partial(filtered_rows, HIGH_DISCOUNT_LOSS),
+                               "Selling_Well_Losses": partial(filtered_rows, SELLING_WELL_LOSS),
+                           }),
+                           file_name="superstore_tables.zip", mime="application/zip",
+                           help="Every panel table for the current filters in one ZIP file")
+
+category_df=panels["category"]
+region_df=panels["region"]
+
+with stage("charts: category and region"):
+    with col1:
+        st.subheader("Category wise Sales")
+        # the category table is per sub-category; charts.bar sums it per category
+        fig=charts.cached("category", filter_key, lambda: charts.bar(category_df,
+                   x="Category",
+                   y="Sales",
+                   color="Category",
+                   template="seaborn",
+                   ))
         st.plotly_chart(fig,
-                     use_container=True,
-                     height=200)
+                         use_container_width=True,
+                         height=200)
+    
+        with col2:
+            st.subheader("Region wise Sales")
+            fig=charts.cached("region", filter_key, lambda: charts.pie(region_df,
+                        names="Region",
+                        values="Sales",
+                        hole=0.5))
+            st.plotly_chart(fig,
+                         use_container_width=True,
+                         height=200)
     
 
-# top 10 orders
-top10orders = df.nlargest(10, 'Sales')
-st.subheader("Top 10 Orders")
-st.write(top10orders)
-# top 10 selling and profitable products
-top10products = df.groupby("Category").agg({'Sales': 'sum', 'Profit': 'sum'}).reset_index() 
-top10products = top10products.nlargest(10, 'Sales')
-st.subheader(" Selling and Profit Products")
-st.write(top10products)
-
-# top 10 states by sales
-top10states = df.groupby("State").agg({'Sales': 'sum', 'Profit': 'sum'}).reset_index() 
-top10states = top10states.nlargest(10, 'Sales')
-st.subheader("Top 10 States")
-st.write(top10states)
-# top 10 cities by sales
-top10cities = df.groupby("City").agg({'Sales': 'sum', 'Profit': 'sum'}).reset_index() 
-top10cities = top10cities.nlargest(10, 'Sales')
-st.subheader("Top 10 Cities")
-st.write(top10cities)
+with stage("top 10 tables"):
+    # top 10 orders
+    top10orders = backend.rows(date1, date2, order_by='Sales', limit=10)
+    st.subheader("Top 10 Orders")
+    st.write(top10orders)
+    # top 10 selling and profitable products
+    top10products = analytics.top(date_panels["category"])
+    st.subheader(" Selling and Profit Products")
+    st.write(top10products)
+
+    # top 10 states by sales
+    top10states = analytics.top(date_panels["state"])
+    st.subheader("Top 10 States")
+    st.write(top10states)
+    # top 10 cities by sales
+    top10cities = analytics.top(date_panels["city"])
+    st.subheader("Top 10 Cities")
+    st.write(top10cities)
  
     
+# analysis sections: each expander is its own fragment, so opening or closing one
+# reruns only that section, and a closed section computes nothing. results are
+# cached by (section, filter state), so reopening a section is free. sections
+# whose results hold pagers or row queries are not cached: those keep the
+# backend, and with it a shared dataset, alive after the dataset is released
+@st.fragment
+def lazy_section(label, key, filter_key, build, render, data, cached=True):
+    # a fragment rerun runs without the rest of the script, so it records
+    # into the profiler of the last full run and exports its own stages
+    profiling.activate(profiler)
+    section=st.expander(label, key=key, on_change="rerun")
+    with section:
+        if section.open:
+            with stage(f"section: {key}") as record:
+                if cached:
+                    result=panel_results.get_or_create((key, filter_key), lambda: build(data))
+                else:
+                    result=build(data)
+                render(result)
+                if isinstance(result.get("table"), pd.DataFrame):
+                    record.rows_out=len(result["table"])
+    profiler.flush()
+
+
+# downloads are built only when clicked, in the format chosen in the sidebar
+def download_data(table, name):
+    st.download_button("Download data", deferred(name, filter_key, export_format, table),
+                       file_name=file_name(name, export_format), mime=mime(export_format),
+                       help=f"Click here to download the data file as {export_format} file")
+
+
+def build_table(table):
+    return {"table": table}
+
+
 # for downloading the data
+def render_category(result):
+    st.write(result["table"].style.background_gradient(cmap="Blues"))
+    download_data(result["table"], "category")
+
+def render_region(result):
+    st.write(result["table"].style.background_gradient(cmap="Oranges"))
+    download_data(result["table"], "Region")
+
 cl1,cl2=st.columns(2)
 with cl1:
-    with st.expander("category_ViewData"):
-        st.write(category_df.style.background_gradient(cmap="Blues"))
-        csv=category_df.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="category.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV")
-        
+    lazy_section("category_ViewData", "category_view", filter_key, build_table, render_category, category_df)
 with cl2:
-    with st.expander("Region_ViewData"):
-        Region=filtered_df.groupby(by="Region",as_index=False)["Sales"].sum()
-        st.write(Region.style.background_gradient(cmap="Oranges"))
-        csv=Region.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="Region.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+    lazy_section("Region_ViewData", "region_view", filter_key, build_table, render_region, region_df)
+
 # for discount
+def build_discount(panels):
+    discount_df = panels["discount"][['Discount', 'Sales']]
+    fig_discount = charts.bar(discount_df, x='Discount', y='Sales', color='Discount', title="Sales by Discount")
+    return {"figure": fig_discount, **build_table(discount_df)}
+
+def render_discount(result):
+    st.plotly_chart(result["figure"], use_container_width=True)
+    download_data(result["table"], "Discount")
+
 st.markdown("---")
 st.markdown("""
             ### 📊 Discount Analysis
             """)
-with st.expander("Discount Analysis"):
-    discount_df = filtered_df.groupby('Discount', as_index=False)['Sales'].sum()
-    fig_discount = px.bar(discount_df, x='Discount', y='Sales', color='Discount', title="Sales by Discount")
-    st.plotly_chart(fig_discount, use_container_width=True)
-    csv=discount_df.to_csv(index=False).encode("utf-8")
-    st.download_button("Download data", csv, file_name="Discount.csv", mime="text/csv",
-                       help="Click here to download the data file as CSV file")
+lazy_section("Discount Analysis", "discount", filter_key, build_discount, render_discount, panels)
+
 # discount increase profit or lead to loss
+def build_discount_profit(panels):
+    discount_profit_df = panels["discount"][['Discount', 'Profit']]
+    fig_discount_profit = charts.bar(discount_profit_df, x='Discount', y='Profit', color='Discount', title="Profit by Discount")
+    return {"figure": fig_discount_profit, **build_table(discount_profit_df)}
+
+def render_discount_profit(result):
+    st.plotly_chart(result["figure"], use_container_width=True)
+    download_data(result["table"], "Discount_Profit")
+
 st.markdown("---")
 st.markdown("""
             ### 📊 Discount Impact on Profit
             """)
-with st.expander("Discount Impact on Profit"):
-    discount_profit_df = filtered_df.groupby('Discount', as_index=False)['Profit'].sum()
-    fig_discount_profit = px.bar(discount_profit_df, x='Discount', y='Profit', color='Discount', title="Profit by Discount")
-    st.plotly_chart(fig_discount_profit, use_container_width=True)
-    csv=discount_profit_df.to_csv(index=False).encode("utf-8")
-    st.download_button("Download data", csv, file_name="Discount_Profit.csv", mime="text/csv",
-                       help="Click here to download the data file as CSV file") 
-    
+lazy_section("Discount Impact on Profit", "discount_profit", filter_key, build_discount_profit, render_discount_profit, panels)
+
 
 # for sales by sub category
+def build_sub_category(panels):
+    sub_category_df = panels["sub_category"]
+    fig_sub_category = charts.bar(sub_category_df, x='Sub-Category', y='Sales', color='Sub-Category', title="Sales by Sub-Category")
+    return {"figure": fig_sub_category, **build_table(sub_category_df)}
+
+def render_sub_category(result):
+    st.plotly_chart(result["figure"], use_container_width=True)
+    download_data(result["table"], "Sub_Category")
+
 st.markdown("---")
 st.subheader("💸 Sales by Sub-Category")
 st.markdown("""
             ### 📊 Sales by Sub-Category
             """)
-with st.expander("Sales by Sub-Category"):
-    sub_category_df = filtered_df.groupby('Sub-Category', as_index=False)['Sales'].sum()
-    fig_sub_category = px.bar(sub_category_df, x='Sub-Category', y='Sales', color='Sub-Category', title="Sales by Sub-Category")
-    st.plotly_chart(fig_sub_category, use_container_width=True)
-    csv=sub_category_df.to_csv(index=False).encode("utf-8")
-    st.download_button("Download data", csv, file_name="Sub_Category.csv", mime="text/csv",
-                       help="Click here to download the data file as CSV file")
-    
+lazy_section("Sales by Sub-Category", "sub_category", filter_key, build_sub_category, render_sub_category, panels)
+
 # most losing and most profitable products
-st.markdown("---")
-st.markdown("""            ### 📊 Most Losing and Most Profitable Products
-            """)
-with st.expander("Most Losing and Most Profitable Products"):
-    most_profitable = filtered_df.loc[filtered_df['Profit'].idxmax()]
-    most_losing = filtered_df.loc[filtered_df['Profit'].idxmin()]
-    
+def build_most_profitable(filtered_rows):
+    most_profitable = filtered_rows(order_by='Profit', limit=1).iloc[0]
+    most_losing = filtered_rows(order_by='Profit', ascending=True, limit=1).iloc[0]
+    return {"most_profitable": most_profitable, "most_losing": most_losing}
+
+def render_most_profitable(result):
+    most_profitable = result["most_profitable"]
+    most_losing = result["most_losing"]
+
     st.write("**Most Profitable Product:**")
     st.write(f"Product Name: {most_profitable['Product Name']}")
     st.write(f"Profit: ${most_profitable['Profit']:.2f}")
-    
+
     st.write("**Most Losing Product:**")
     st.write(f"Product Name: {most_losing['Product Name']}")
     st.write(f"Loss: ${-most_losing['Profit']:.2f}")
-    csv=most_profitable.to_csv(index=False).encode("utf-8")
-    st.download_button("Download data", csv, file_name="Most_Profitable.csv", mime="text/csv",
-                       help="Click here to download the data file as CSV file")
+    download_data(result["most_profitable"].to_frame().T, "Most_Profitable")
 
-# most losing and most profitable products by sub category
 st.markdown("---")
-st.markdown("""            ### 📊 Most Losing and Most Profitable Products by Sub-Category
+st.markdown("""            ### 📊 Most Losing and Most Profitable Products
             """)
-with st.expander("Most Losing and Most Profitable Products by Sub-Category"):
-    most_profitable_sub_category = filtered_df.loc[filtered_df['Profit'].idxmax(), ['Sub-Category', 'Profit']]
-    most_losing_sub_category = filtered_df.loc[filtered_df['Profit'].idxmin(), ['Sub-Category', 'Profit']]
+lazy_section("Most Losing and Most Profitable Products", "most_profitable", filter_key,
+             build_most_profitable, render_most_profitable, filtered_rows)
+
+# most losing and most profitable products by sub category
+def build_most_profitable_sub_category(filtered_rows):
+    most_profitable_sub_category = filtered_rows(order_by='Profit', limit=1).iloc[0][['Sub-Category', 'Profit']]
+    most_losing_sub_category = filtered_rows(order_by='Profit', ascending=True, limit=1).iloc[0][['Sub-Category', 'Profit']]
+    return {"most_profitable": most_profitable_sub_category, "most_losing": most_losing_sub_category}
+
+def render_most_profitable_sub_category(result):
+    most_profitable_sub_category = result["most_profitable"]
+    most_losing_sub_category = result["most_losing"]
     st.write("**Most Profitable Sub-Category:**")
     st.write(f"Sub-Category: {most_profitable_sub_category['Sub-Category']}")
     st.write(f"Profit: ${most_profitable_sub_category['Profit']:.2f}")
-    
+
     st.write("**Most Losing Sub-Category:**")
     st.write(f"Sub-Category: {most_losing_sub_category['Sub-Category']}")
     st.write(f"Loss: ${-most_losing_sub_category['Profit']:.2f}")
-    csv=most_profitable_sub_category.to_csv(index=False).encode("utf-8")
-    st.download_button("Download data", csv, file_name="Most_Profitable_Sub-Category.csv", mime="text/csv",
-                       help="Click here to download the data file as CSV file")
-    
-# sub-categories are giving losses despite high discounts
+    download_data(result["most_profitable"].to_frame().T, "Most_Profitable_Sub-Category")
+
 st.markdown("---")
-st.subheader("📉 Sub-Categories with High Discounts but Losses")
-with st.expander("Sub-Categories with High Discounts but Losses"):
-    high_discount_loss = filtered_df[(filtered_df['Discount'] > 0.3) & (filtered_df['Profit'] < 0)]
-    if not high_discount_loss.empty:
+st.markdown("""            ### 📊 Most Losing and Most Profitable Products by Sub-Category
+            """)
+lazy_section("Most Losing and Most Profitable Products by Sub-Category", "most_profitable_sub_category", filter_key,
+             build_most_profitable_sub_category, render_most_profitable_sub_category, filtered_rows)
+
+# sub-categories are giving losses despite high discounts
+def build_high_discount_loss(filtered):
+    filtered_rows, filtered_pager = filtered
+    # the download builds the full table only when clicked
+    return {"pager": filtered_pager(HIGH_DISCOUNT_LOSS), "table": partial(filtered_rows, HIGH_DISCOUNT_LOSS)}
+
+def render_high_discount_loss(result):
+    high_discount_loss = result["pager"]
+    if high_discount_loss.count() > 0:
         st.write("Sub-Categories with High Discounts but Losses:")
-        st.write(high_discount_loss[['Sub-Category', 'Discount', 'Profit']])
-        csv=high_discount_loss.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="High_Discount_Losses.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+        show_page(high_discount_loss, "high_discount_loss_rows", ['Sub-Category', 'Discount', 'Profit'])
+        download_data(result["table"], "High_Discount_Losses")
     else:
         st.write("No sub-categories found with high discounts and losses.")
 
-# states/cities are incurring losses consistently
 st.markdown("---")
-st.subheader("📉 States/Cities with Consistent Losses")
-with st.expander("States/Cities with Consistent Losses"):
-    consistent_loss = filtered_df.groupby(['State', 'City']).agg({'Profit': 'sum'}).reset_index()
-    consistent_loss = consistent_loss[consistent_loss['Profit'] < 0]
-    
+st.subheader("📉 Sub-Categories with High Discounts but Losses")
+lazy_section("Sub-Categories with High Discounts but Losses", "high_discount_loss", filter_key,
+             build_high_discount_loss, render_high_discount_loss, (filtered_rows, filtered_pager), cached=False)
+
+# states/cities are incurring losses consistently
+def build_consistent_loss(panels):
+    return build_table(analytics.consistent_losses(panels))
+
+def render_consistent_loss(result):
+    consistent_loss = result["table"]
     if not consistent_loss.empty:
         st.write("States/Cities with Consistent Losses:")
         st.write(consistent_loss)
-        csv=consistent_loss.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="Consistent_Losses.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+        download_data(result["table"], "Consistent_Losses")
     else:
         st.write("No states/cities found with consistent losses.")
 
-# Any product that’s selling well but giving a loss
 st.markdown("---")
-st.subheader("📉 Products Selling Well but Giving Losses")
-with st.expander("Products Selling Well but Giving Losses"):
-    selling_well_loss = filtered_df[(filtered_df['Sales'] > 1000) & (filtered_df['Profit'] < 0)]
-    
-    if not selling_well_loss.empty:
+st.subheader("📉 States/Cities with Consistent Losses")
+lazy_section("States/Cities with Consistent Losses", "consistent_loss", filter_key,
+             build_consistent_loss, render_consistent_loss, panels)
+
+# Any product that’s selling well but giving a loss
+def build_selling_well_loss(filtered):
+    filtered_rows, filtered_pager = filtered
+    return {"pager": filtered_pager(SELLING_WELL_LOSS), "table": partial(filtered_rows, SELLING_WELL_LOSS)}
+
+def render_selling_well_loss(result):
+    selling_well_loss = result["pager"]
+    if selling_well_loss.count() > 0:
         st.write("Products Selling Well but Giving Losses:")
-        st.write(selling_well_loss[['Product Name', 'Sales', 'Profit']])
-        csv=selling_well_loss.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="Selling_Well_Losses.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+        show_page(selling_well_loss, "selling_well_loss_rows", ['Product Name', 'Sales', 'Profit'])
+        download_data(result["table"], "Selling_Well_Losses")
     else:
-        st.write("No products found that are selling well but giving losses.")  
+        st.write("No products found that are selling well but giving losses.")
 
-# most used delivery way
 st.markdown("---")
-st.subheader("🚚 Most Used Delivery Way")
-with st.expander("Most Used Delivery Way"):
-    delivery_way_count = filtered_df['Ship Mode'].value_counts().reset_index()
-    delivery_way_count.columns = ['Ship Mode', 'Count']
-    
+st.subheader("📉 Products Selling Well but Giving Losses")
+lazy_section("Products Selling Well but Giving Losses", "selling_well_loss", filter_key,
+             build_selling_well_loss, render_selling_well_loss, (filtered_rows, filtered_pager), cached=False)
+
+# most used delivery way
+def build_delivery_way_count(panels):
+    delivery_way_count = analytics.ship_mode_counts(panels)
+    fig_delivery = charts.bar(delivery_way_count, x='Ship Mode', y='Count', color='Ship Mode', title="Most Used Delivery Way")
+    return {"figure": fig_delivery, **build_table(delivery_way_count)}
+
+def render_delivery_way_count(result):
+    delivery_way_count = result["table"]
     if not delivery_way_count.empty:
         st.write("Most Used Delivery Way:")
         st.write(delivery_way_count)
-        fig_delivery = px.bar(delivery_way_count, x='Ship Mode', y='Count', color='Ship Mode', title="Most Used Delivery Way")
-        st.plotly_chart(fig_delivery, use_container_width=True)
-        csv=delivery_way_count.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="Most_Used_Delivery_Way.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+        st.plotly_chart(result["figure"], use_container_width=True)
+        download_data(result["table"], "Most_Used_Delivery_Way")
     else:
         st.write("No delivery way data available.")
-    
-# most profitable delivery way
+
 st.markdown("---")
-st.subheader("🚚 Most Profitable Delivery Way")
-with st.expander("Most Profitable Delivery Way"):
-    delivery_profit = filtered_df.groupby('Ship Mode', as_index=False)['Profit'].sum()
-    
+st.subheader("🚚 Most Used Delivery Way")
+lazy_section("Most Used Delivery Way", "delivery_way_count", filter_key,
+             build_delivery_way_count, render_delivery_way_count, panels)
+
+# most profitable delivery way
+def build_delivery_profit(panels):
+    delivery_profit = analytics.ship_mode_profit(panels)
+    fig_delivery_profit = charts.bar(delivery_profit, x='Ship Mode', y='Profit', color='Ship Mode', title="Most Profitable Delivery Way")
+    return {"figure": fig_delivery_profit, **build_table(delivery_profit)}
+
+def render_delivery_profit(result):
+    delivery_profit = result["table"]
     if not delivery_profit.empty:
         st.write("Most Profitable Delivery Way:")
         st.write(delivery_profit)
-        fig_delivery_profit = px.bar(delivery_profit, x='Ship Mode', y='Profit', color='Ship Mode', title="Most Profitable Delivery Way")
-        st.plotly_chart(fig_delivery_profit, use_container_width=True)
-        csv=delivery_profit.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="Most_Profitable_Delivery_Way.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+        st.plotly_chart(result["figure"], use_container_width=True)
+        download_data(result["table"], "Most_Profitable_Delivery_Way")
     else:
         st.write("No delivery profit data available.")
 
-# customer segment analysis
 st.markdown("---")
-st.subheader("👥 Customer Segment Analysis")
-with st.expander("Customer Segment Analysis"):
-    customer_segment = filtered_df.groupby('Segment', as_index=False)[['Sales', 'Profit']].sum()
+st.subheader("🚚 Most Profitable Delivery Way")
+lazy_section("Most Profitable Delivery Way", "delivery_profit", filter_key,
+             build_delivery_profit, render_delivery_profit, panels)
 
-    
+# customer segment analysis
+def build_customer_segment(panels):
+    customer_segment = panels["segment"]
+    fig_customer_segment = charts.bar(customer_segment, x='Segment', y='Sales', color='Segment', title="Customer Segment Analysis")
+    return {"figure": fig_customer_segment, **build_table(customer_segment)}
+
+def render_customer_segment(result):
+    customer_segment = result["table"]
     if not customer_segment.empty:
         st.write("Customer Segment Analysis:")
         st.write(customer_segment)
-        fig_customer_segment = px.bar(customer_segment, x='Segment', y='Sales', color='Segment', title="Customer Segment Analysis")
-        st.plotly_chart(fig_customer_segment, use_container_width=True)
-        csv=customer_segment.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="Customer_Segment_Analysis.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+        st.plotly_chart(result["figure"], use_container_width=True)
+        download_data(result["table"], "Customer_Segment_Analysis")
     else:
-        st.write("No customer segment data available.") 
+        st.write("No customer segment data available.")
+
+st.markdown("---")
+st.subheader("👥 Customer Segment Analysis")
+lazy_section("Customer Segment Analysis", "customer_segment", filter_key,
+             build_customer_segment, render_customer_segment, panels)
 
 
 # hirerichal graph
-st.markdown("---")
-st.subheader("📊 Hierarchical Graph of Sales by Region, State, and City"
-             " and Product Category")
-with st.expander("Hierarchical Graph of Sales by Region, State, and City and Product Category"):
-    hierarchy_df = filtered_df.groupby(['Region', 'State', 'City', 'Category'], as_index=False)['Sales'].sum()
-    
-    if not hierarchy_df.empty:
-        fig_hierarchy = px.treemap(hierarchy_df, path=['Region', 'State', 'City', 'Category'], values='Sales',
-                                   color='Sales', title="Hierarchical Graph of Sales")
-        st.plotly_chart(fig_hierarchy, use_container_width=True)
-        csv=hierarchy_df.to_csv(index=False).encode("utf-8")
-        st.download_button("Download data", csv, file_name="Hierarchical_Sales.csv", mime="text/csv",
-                           help="Click here to download the data file as CSV file")
+def build_hierarchy(panels):
+    hierarchy_df = panels["hierarchy"]
+    if hierarchy_df.empty:
+        return {"table": hierarchy_df}
+    # small cities and states are folded into "Other" tiles above the chart's leaf budget
+    fig_hierarchy = charts.treemap(hierarchy_df, ['Region', 'State', 'City', 'Category'], 'Sales',
+                                   title="Hierarchical Graph of Sales")
+    return {"figure": fig_hierarchy, **build_table(hierarchy_df)}
+
+def render_hierarchy(result):
+    if not result["table"].empty:
+        st.plotly_chart(result["figure"], use_container_width=True)
+        download_data(result["table"], "Hierarchical_Sales")
     else:
         st.write("No hierarchical data available.")
         st.write("""        No hierarchical data available for the selected filters.""")
 
+st.markdown("---")
+st.subheader("📊 Hierarchical Graph of Sales by Region, State, and City"
+             " and Product Category")
+lazy_section("Hierarchical Graph of Sales by Region, State, and City and Product Category", "hierarchy", filter_key,
+             build_hierarchy, render_hierarchy, panels)
+
 
 
 # Sidebar button
@@ -444,5 +661,15 @@ if show_analysis:
 27. **Most Used Customer Segment:** The dashboard shows that the most used customer segment is **Consumer**. This segment accounted for 50% of the total sales.  
 28. **Most Profitable Customer Segment:** The dashboard shows that the most profitable customer segment is **Consumer**. This segment accounted for 40% of the total profits.  
 """)
- 
-    
\ No newline at end of file
+
+
+# the debug toggle sits at the bottom of the sidebar; its value is read from
+# the session state at the top of the script, before the first stage
+st.sidebar.toggle("🐞 Performance debug", key="debug_profile", value=profiling.ENABLED_BY_DEFAULT,
+                  help="Time every stage of this rerun and show the timings here")
+if debug:
+    with st.sidebar.expander("⏱️ Stage timings", expanded=True):
+        st.caption(f"Rerun took {profiler.total_seconds() * 1000:,.0f} ms in the timed stages")
+        timings=pd.DataFrame(profiler.table()).astype({"rows in": "Int64", "rows out": "Int64"})
+        st.dataframe(timings, hide_index=True)
+profiler.flush()
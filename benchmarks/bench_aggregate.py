@@ -0,0 +1,77 @@
+"""Compare per-panel groupbys with the single-pass aggregation engine.
+
+Usage: python benchmarks/bench_aggregate.py [--scale N] [--repeat R]
+
+``--scale`` concatenates the bundled dataset N times to simulate larger
+exports. Both approaches run over the same raw order lines; the engine is
+also timed over the sales cube cells, which is what the dashboard feeds it.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from superstore.aggregate import DATE_PANELS, FILTERED_PANELS, aggregate  # noqa: E402
+from superstore.cube import SalesCube  # noqa: E402
+from superstore.loader import DASHBOARD_COLUMNS, load_path  # noqa: E402
+
+
+def per_panel_groupbys(df):
+    """The groupbys the dashboard ran before the aggregation engine, one per panel."""
+    return [
+        df.groupby(by=["Category", "Sub-Category"], as_index=False, observed=True)["Sales"].sum(),
+        df.groupby(by="Region", as_index=False, observed=True)["Sales"].sum(),
+        df.groupby("Discount", as_index=False, observed=True)["Sales"].sum(),
+        df.groupby("Discount", as_index=False, observed=True)["Profit"].sum(),
+        df.groupby("Sub-Category", as_index=False, observed=True)["Sales"].sum(),
+        df["Ship Mode"].value_counts(),
+        df.groupby("Ship Mode", as_index=False, observed=True)["Profit"].sum(),
+        df.groupby("Segment", as_index=False, observed=True)[["Sales", "Profit"]].sum(),
+        df.groupby(["State", "City"], observed=True).agg({"Profit": "sum"}).reset_index(),
+        df.groupby(["Region", "State", "City", "Category"], as_index=False, observed=True)["Sales"].sum(),
+        df.groupby("Category", observed=True).agg({"Sales": "sum", "Profit": "sum"}).reset_index(),
+        df.groupby("State", observed=True).agg({"Sales": "sum", "Profit": "sum"}).reset_index(),
+        df.groupby("City", observed=True).agg({"Sales": "sum", "Profit": "sum"}).reset_index(),
+    ]
+
+
+def single_pass(df):
+    return aggregate(df, {**FILTERED_PANELS, **{"date_" + k: v for k, v in DATE_PANELS.items()}})
+
+
+def best_of(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=100, help="times to replicate the bundled dataset")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per approach; the best is reported")
+    args = parser.parse_args()
+
+    df = load_path(columns=DASHBOARD_COLUMNS)
+    if args.scale > 1:
+        df = pd.concat([df] * args.scale, ignore_index=True)
+
+    baseline = best_of(per_panel_groupbys, df, args.repeat)
+    engine = best_of(single_pass, df, args.repeat)
+    cells = SalesCube.build(df).cells
+    engine_cube = best_of(single_pass, cells, args.repeat)
+    print(f"rows:               {len(df):,}")
+    print(f"per-panel groupbys: {baseline * 1000:9.1f} ms")
+    print(f"single pass:        {engine * 1000:9.1f} ms")
+    print(f"speedup:            {baseline / engine:9.2f}x")
+    print(f"single pass (cube): {engine_cube * 1000:9.1f} ms  ({len(cells):,} cells)")
+
+
+if __name__ == "__main__":
+    main()
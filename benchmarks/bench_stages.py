@@ -0,0 +1,280 @@
+"""Time every stage of a dashboard rerun, headless, with wall time and peak memory.
+
+Usage: python benchmarks/bench_stages.py [SOURCE] [--rows 1M] [--database PATH]
+                                         [--repeat R] [--output FILE] [--baseline FILE]
+
+``SOURCE`` is a CSV or Excel file (default: the bundled dataset). With
+``--rows`` a synthetic dataset of that size is generated first (see
+``generate_data.py``) and reused on later runs; with ``--database`` the
+stages run through the SQL backend instead of the in-memory one.
+
+The stages follow a rerun of SuperStoreDashboard.py: load, index builds,
+the date window and KPIs, the Region/State/City filter, each panel's
+aggregation, the row-level queries and the construction of each figure
+(including its JSON serialization, which ``st.plotly_chart`` does). Each
+stage is timed ``--repeat`` times (loads once, since only a cold load is
+meaningful). Peak memory is measured in a separate pass as the growth of
+the process's peak RSS over the stage, which also covers the CSV parser
+and Arrow buffers; where the peak RSS cannot be reset (outside Linux) it
+falls back to tracemalloc, which only sees Python and numpy allocations.
+
+``--output`` saves the results as JSON; ``--baseline`` compares against a
+saved run and exits with status 1 if any stage got slower than the
+tolerance, so regressions in the hot paths fail a pre-deploy check.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_data import default_path, parse_rows, write_csv  # noqa: E402
+from superstore import charts, storage  # noqa: E402
+from superstore.aggregate import DATE_PANELS, FILTERED_PANELS, aggregate  # noqa: E402
+from superstore.backend import FrameBackend  # noqa: E402
+from superstore.cube import LINES, SalesCube  # noqa: E402
+from superstore.dates import DateIndex  # noqa: E402
+from superstore.filters import FilterIndex  # noqa: E402
+from superstore.ingest import DEFAULT_CHUNK_ROWS, STREAM_THRESHOLD_BYTES  # noqa: E402
+from superstore.loader import DASHBOARD_COLUMNS, DEFAULT_DATASET, clear_cache, load_path, path_key  # noqa: E402
+from superstore.sql import DEFAULT_TABLE, SqlBackend  # noqa: E402
+
+# stages faster than this are not reported as regressions, whatever their ratio
+NOISE_FLOOR_MS = 2.0
+HIGH_DISCOUNT_LOSS = [("Discount", ">", 0.3), ("Profit", "<", 0)]
+
+# the dashboard's figures, built from the panel tables
+FIGURES = {
+    "category bar": lambda p: charts.bar(p["category"], x="Category", y="Sales", color="Category", template="seaborn"),
+    "region pie": lambda p: charts.pie(p["region"], names="Region", values="Sales", hole=0.5),
+    "discount sales": lambda p: charts.bar(p["discount"], x="Discount", y="Sales", color="Discount"),
+    "discount profit": lambda p: charts.bar(p["discount"], x="Discount", y="Profit", color="Discount"),
+    "sub-category": lambda p: charts.bar(p["sub_category"], x="Sub-Category", y="Sales", color="Sub-Category"),
+    "ship mode count": lambda p: charts.bar(p["ship_mode"], x="Ship Mode", y=LINES, color="Ship Mode"),
+    "ship mode profit": lambda p: charts.bar(p["ship_mode"], x="Ship Mode", y="Profit", color="Ship Mode"),
+    "segment": lambda p: charts.bar(p["segment"], x="Segment", y="Sales", color="Segment"),
+    "hierarchy treemap": lambda p: charts.treemap(p["hierarchy"], ["Region", "State", "City", "Category"], "Sales"),
+}
+
+
+class Stage:
+    def __init__(self, name, run, setup=None, repeat=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.repeat = repeat
+
+
+def scenario(backend):
+    """A date window with partial months at both ends and a Region plus two of its States."""
+    span = backend.last - backend.first
+    start = (backend.first + span * 0.15).normalize()
+    end = (backend.last - span * 0.15).normalize()
+    regions = backend.options("Region", start, end)[:1]
+    states = backend.options("State", start, end, {"Region": regions})[:2]
+    return start, end, {"Region": regions, "State": states, "City": []}
+
+
+def options(backend, start, end, selections):
+    backend.options("Region", start, end)
+    backend.options("State", start, end, {"Region": selections["Region"]})
+    backend.options("City", start, end, {"Region": selections["Region"], "State": selections["State"]})
+
+
+def figure_stages(panels):
+    return [Stage(f"figure: {name}", lambda build=build: build(panels).to_json()) for name, build in FIGURES.items()]
+
+
+def frame_stages(source):
+    """Stages of a rerun over the in-memory backend."""
+    # large files are streamed, like an upload above the threshold
+    chunk_rows = DEFAULT_CHUNK_ROWS if os.path.getsize(source) > STREAM_THRESHOLD_BYTES else None
+
+    def cold():
+        clear_cache()
+        path = storage.cache_path(path_key(source))
+        if os.path.exists(path):
+            os.remove(path)
+
+    def load():
+        return load_path(source, DASHBOARD_COLUMNS, chunk_rows)
+
+    df = load()
+    backend = FrameBackend(df)
+    start, end, selections = scenario(backend)
+    window_rows = backend.rows(start, end)
+    cells = backend.cube.select(window_rows, start, end, selections)
+    date_cells = backend.cube.select(window_rows, start, end)
+    panels = aggregate(cells)
+
+    stages = [
+        Stage("load: parse source", load, cold, repeat=1),
+        Stage("load: columnar cache", load, clear_cache, repeat=1),
+        Stage("index: order date", lambda: DateIndex(df)),
+        Stage("index: filters", lambda: FilterIndex(df)),
+        Stage("index: sales cube", lambda: SalesCube.build(df)),
+        # a new backend per run, so its per-rerun memo does not hide the work
+        Stage("filter: date window + KPIs", lambda: FrameBackend(df).totals(start, end)),
+        Stage("filter: region/state/city options", lambda: options(FrameBackend(df), start, end, selections)),
+        Stage("filter: region/state/city rows", lambda: FrameBackend(df).rows(start, end, selections)),
+        Stage("cube: select cells", lambda: backend.cube.select(window_rows, start, end, selections)),
+    ]
+    stages += [
+        Stage(f"panel: {name}", lambda spec={name: spec}: aggregate(cells, spec))
+        for name, spec in FILTERED_PANELS.items()
+    ]
+    stages += [
+        Stage(f"date panel: {name}", lambda spec={name: spec}: aggregate(date_cells, spec))
+        for name, spec in DATE_PANELS.items()
+    ]
+    stages += [
+        Stage("panels: all, one pass", lambda: aggregate(cells)),
+        Stage("rows: top 10 orders", lambda: FrameBackend(df).rows(start, end, order_by="Sales", limit=10)),
+        Stage("rows: high discount losses", lambda: FrameBackend(df).rows(start, end, selections, HIGH_DISCOUNT_LOSS)),
+    ]
+    return len(df), stages + figure_stages(panels)
+
+
+def sql_stages(path, table):
+    """Stages of a rerun over the SQL backend, with its result cache cleared before each run."""
+    backend = SqlBackend(path, table)
+    start, end, selections = scenario(backend)
+    panels = backend.panels(start, end, selections)
+    n_rows = int(backend.query(f'SELECT COUNT(*) AS n FROM "{table}"')["n"].iloc[0])
+    clear = backend.clear_cache
+
+    stages = [
+        Stage("load: open database", lambda: SqlBackend(path, table), repeat=1),
+        Stage("filter: date window + KPIs", lambda: backend.totals(start, end), clear),
+        Stage("filter: region/state/city options", lambda: options(backend, start, end, selections), clear),
+    ]
+    stages += [
+        Stage(f"panel: {name}", lambda spec={name: spec}: backend.panels(start, end, selections, spec), clear)
+        for name, spec in FILTERED_PANELS.items()
+    ]
+    stages += [
+        Stage(f"date panel: {name}", lambda spec={name: spec}: backend.panels(start, end, panels=spec), clear)
+        for name, spec in DATE_PANELS.items()
+    ]
+    stages += [
+        Stage("panels: all, one pass", lambda: backend.panels(start, end, selections), clear),
+        Stage("rows: top 10 orders", lambda: backend.rows(start, end, order_by="Sales", limit=10), clear),
+        Stage("rows: high discount losses", lambda: backend.rows(start, end, selections, HIGH_DISCOUNT_LOSS), clear),
+    ]
+    return n_rows, stages + figure_stages(panels)
+
+
+def time_stage(stage, repeat):
+    times = []
+    for _ in range(stage.repeat or repeat):
+        if stage.setup is not None:
+            stage.setup()
+        started = time.perf_counter()
+        stage.run()
+        times.append((time.perf_counter() - started) * 1000)
+    return {"min_ms": min(times), "median_ms": statistics.median(times)}
+
+
+def _status_kib(field):
+    with open("/proc/self/status") as handle:
+        for line in handle:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS (VmHWM) of this process; False where that is not supported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_memory(stage):
+    """Peak memory in MiB the stage needs on top of what the process already holds."""
+    if stage.setup is not None:
+        stage.setup()
+    if _reset_peak_rss():
+        before = _status_kib("VmRSS")
+        stage.run()
+        return max(_status_kib("VmHWM") - before, 0) / 1024
+    tracemalloc.start()
+    try:
+        stage.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def compare(results, baseline, tolerance):
+    """Names of the stages slower than ``baseline`` by more than ``tolerance``."""
+    slower = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["median_ms"] > before["median_ms"] * (1 + tolerance) + NOISE_FLOOR_MS:
+            slower.append(name)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", nargs="?", default=DEFAULT_DATASET, help="CSV or Excel file")
+    parser.add_argument("--rows", help="generate (once) and use a synthetic dataset of this size, e.g. 1M")
+    parser.add_argument("--database", help="DuckDB or SQLite file to run the stages through the SQL backend")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory pass")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    if args.database:
+        source = args.database
+        n_rows, stages = sql_stages(args.database, args.table)
+    else:
+        source = args.source
+        if args.rows:
+            source = default_path(args.rows)
+            if not os.path.exists(source):
+                print(f"Generating {parse_rows(args.rows):,} rows into {source} ...")
+                write_csv(source, parse_rows(args.rows))
+        n_rows, stages = frame_stages(source)
+
+    results = {}
+    for stage in stages:
+        results[stage.name] = time_stage(stage, args.repeat)
+    if not args.no_memory:
+        for stage in stages:
+            results[stage.name]["peak_mib"] = peak_memory(stage)
+
+    print(f"{source}: {n_rows:,} rows")
+    print(f"{'stage':<40}{'min ms':>12}{'median ms':>12}{'peak MiB':>12}")
+    for name, result in results.items():
+        peak = f"{result['peak_mib']:>12.1f}" if "peak_mib" in result else f"{'-':>12}"
+        print(f"{name:<40}{result['min_ms']:>12.2f}{result['median_ms']:>12.2f}{peak}")
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({"source": source, "rows": n_rows, "stages": results}, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline) as handle:
+            slower = compare(results, json.load(handle)["stages"], args.tolerance)
+        for name in slower:
+            print(f"REGRESSION: {name}")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Generate synthetic Superstore datasets of any size from the bundled one.
+
+Usage: python benchmarks/generate_data.py ROWS [--output PATH] [--seed S] [--chunk-rows N]
+
+``ROWS`` takes k/M suffixes (100k, 1M, 10M, 50M). The output has the
+columns of ``cleaned_superstore.csv`` and is written in chunks, so memory
+use does not depend on ``ROWS``. By default it goes to
+``benchmarks/data/superstore_<ROWS>.csv``.
+
+Orders are resampled from the bundled data: each synthetic order copies the
+header (order date, ship delay, ship mode, customer, segment and the
+Region/State/City location) of a random real order, gets a line count
+drawn from the real lines-per-order distribution, and each line copies the
+product, quantity and discount of a random real line from the same state,
+so the geography hierarchy, the Discount levels and their regional mix, and
+the date spread are kept. Sales and Profit are scaled together by a small
+random factor, which keeps the margins while avoiding duplicate rows.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from superstore.loader import DEFAULT_DATASET  # noqa: E402
+from superstore.schema import CSV_ENCODING, parse_dates  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_CHUNK_ROWS = 500_000
+HEADER_COLUMNS = [
+    "Order Date", "Ship Mode", "Customer ID", "Customer Name", "Segment",
+    "Country", "City", "State", "Postal Code", "Region",
+]
+LINE_COLUMNS = ["Product ID", "Category", "Sub-Category", "Product Name", "Sales", "Quantity", "Discount", "Profit"]
+DISCOUNT_BINS = [0, 0.1, 0.2, 0.3, 0.5, 0.7, 1.0]
+# sigma of the log-normal factor applied to Sales and Profit
+PRICE_NOISE = 0.1
+
+
+def parse_rows(text):
+    """``"100k"`` -> 100000, ``"1M"`` -> 1000000."""
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+class SyntheticSuperstore:
+    """Resampling model of a Superstore dataset."""
+
+    def __init__(self, source=DEFAULT_DATASET, seed=0):
+        df = parse_dates(pd.read_csv(source, encoding=CSV_ENCODING))
+        self.columns = df.columns.tolist()
+        self.rng = np.random.default_rng(seed)
+
+        orders = df.drop_duplicates("Order ID")
+        self.headers = orders[HEADER_COLUMNS].reset_index(drop=True)
+        self.delays = (orders["Ship Date"] - orders["Order Date"]).to_numpy()
+        self.prefixes = orders["Order ID"].str.split("-").str[0].to_numpy()
+        self.lines_per_order = df.groupby("Order ID", sort=False).size().to_numpy()
+        self.lines = df[LINE_COLUMNS].reset_index(drop=True)
+
+        # lines grouped by state, so a synthetic line is drawn from its order's state
+        states = pd.Categorical(df["State"])
+        self.header_states = pd.Categorical(orders["State"], categories=states.categories).codes
+        self.line_order = np.argsort(states.codes, kind="stable")
+        self.state_counts = np.bincount(states.codes, minlength=len(states.categories))
+        self.state_offsets = np.concatenate([[0], np.cumsum(self.state_counts)[:-1]])
+
+        # categoricals make the per-chunk takes cheap
+        for frame in (self.headers, self.lines):
+            for column in frame.select_dtypes(exclude=["number", "datetime"]).columns:
+                frame[column] = frame[column].astype("category")
+
+    def chunk(self, n_rows, first_row, first_order):
+        """``n_rows`` synthetic order lines; returns the frame and the number of orders used."""
+        rng = self.rng
+        # every order has at least one line, so n_rows orders are always enough
+        sizes = rng.choice(self.lines_per_order, size=n_rows)
+        n_orders = int(np.searchsorted(np.cumsum(sizes), n_rows)) + 1
+        sizes = sizes[:n_orders]
+        picks = rng.integers(0, len(self.headers), n_orders)
+        header_rows = np.repeat(picks, sizes)[:n_rows]
+        serials = np.repeat(np.arange(first_order, first_order + n_orders), sizes)[:n_rows]
+
+        states = self.header_states[header_rows]
+        offsets = (rng.random(n_rows) * self.state_counts[states]).astype(np.int64)
+        line_rows = self.line_order[self.state_offsets[states] + offsets]
+
+        frame = self.headers.take(header_rows).reset_index(drop=True)
+        lines = self.lines.take(line_rows).reset_index(drop=True)
+        for column in LINE_COLUMNS:
+            frame[column] = lines[column]
+        scale = rng.lognormal(0.0, PRICE_NOISE, n_rows)
+        frame["Sales"] = (frame["Sales"] * scale).round(4)
+        frame["Profit"] = (frame["Profit"] * scale).round(4)
+
+        order_dates = frame["Order Date"]
+        frame["Ship Date"] = order_dates + self.delays[header_rows]
+        frame["Row ID"] = np.arange(first_row, first_row + n_rows)
+        frame["Order ID"] = (
+            pd.Series(self.prefixes[header_rows]) + "-" + order_dates.dt.year.astype(str)
+            + "-" + pd.Series(serials).astype(str).str.zfill(6)
+        )
+        frame["Order Month"] = order_dates.dt.month
+        frame["Order Year"] = order_dates.dt.year
+        frame["Discount Range"] = pd.cut(frame["Discount"], DISCOUNT_BINS)
+        frame["Profit per Unit"] = frame["Profit"] / frame["Quantity"]
+        frame["Delivery Time"] = (frame["Ship Date"] - order_dates).dt.days
+        return frame[self.columns], n_orders
+
+    def chunks(self, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Yield ``n_rows`` synthetic order lines in frames of at most ``chunk_rows`` rows."""
+        # order numbers start past the real ones' width so the Order IDs never collide
+        first_row, first_order = 1, 1_000_000
+        while first_row <= n_rows:
+            size = min(chunk_rows, n_rows - first_row + 1)
+            frame, n_orders = self.chunk(size, first_row, first_order)
+            first_row += size
+            first_order += n_orders
+            yield frame
+
+
+def write_csv(path, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, source=DEFAULT_DATASET):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    model = SyntheticSuperstore(source, seed)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding=CSV_ENCODING, errors="replace", newline="") as sink:
+            for i, frame in enumerate(model.chunks(n_rows, chunk_rows)):
+                frame.to_csv(sink, index=False, header=i == 0, date_format="%Y-%m-%d")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def default_path(rows_text):
+    return os.path.join(DATA_DIR, f"superstore_{rows_text}.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", help="number of order lines, e.g. 100k, 1M, 10M, 50M")
+    parser.add_argument("--output", help="CSV file to write (default: benchmarks/data/superstore_<rows>.csv)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+    path = write_csv(args.output or default_path(args.rows), parse_rows(args.rows), args.chunk_rows, args.seed)
+    print(f"Wrote {parse_rows(args.rows):,} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Lets pytest import the ``superstore`` package from the repository root."""
@@ -0,0 +1 @@
+"""Data layer for the SuperStore Sales Dashboard."""
@@ -0,0 +1,149 @@
+"""Single-pass aggregation of every dashboard panel.
+
+Key columns are turned into integer codes (categorical codes are used as
+they are, other columns are factorized), the codes of a panel's keys are
+combined into one group code per row and the measures are reduced with
+``np.bincount``. Panels whose keys are a subset of another panel's keys are
+rolled up from that panel's small result table, so the rows are only
+scanned once per independent key set rather than once per panel. A missing
+key value is a group of its own in the scanned table, and each panel only
+drops the groups missing one of its own keys, as ``groupby(keys)`` would.
+
+The input is either raw order lines or cube cells from ``superstore.cube``;
+the ``Lines`` measure counts order lines in both cases.
+"""
+import numpy as np
+import pandas as pd
+
+from superstore.cube import LINES
+
+# panel name -> (key columns, measures)
+FILTERED_PANELS = {
+    "category": (["Category", "Sub-Category"], ["Sales"]),
+    "region": (["Region"], ["Sales"]),
+    "discount": (["Discount"], ["Sales", "Profit"]),
+    "sub_category": (["Sub-Category"], ["Sales"]),
+    "ship_mode": (["Ship Mode"], [LINES, "Profit"]),
+    "segment": (["Segment"], ["Sales", "Profit"]),
+    "state_city": (["State", "City"], ["Profit"]),
+    "hierarchy": (["Region", "State", "City", "Category"], ["Sales"]),
+}
+# panels computed over the date window only, ignoring the Region/State/City filters
+DATE_PANELS = {
+    "category": (["Category"], ["Sales", "Profit"]),
+    "state": (["State"], ["Sales", "Profit"]),
+    "city": (["City"], ["Sales", "Profit"]),
+}
+# above this many possible key combinations the group codes are compacted first
+MAX_DENSE_GROUPS = 1 << 22
+
+
+def _factorize(series):
+    """Integer codes (-1 for missing) and the values they stand for."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, uniques
+
+
+def _decode(codes, uniques, dtype):
+    """The values of ``codes``, with -1 decoded as missing."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(codes, dtype=dtype)
+    return pd.api.extensions.take(np.asarray(uniques), codes, allow_fill=True)
+
+
+class PanelAggregates:
+    """The tables produced by one ``aggregate`` call, looked up by panel name."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def __contains__(self, name):
+        return name in self.tables
+
+
+def plan(panels):
+    """Split panels into bases scanned from the rows and children rolled up from a base.
+
+    A panel whose keys are a subset of a larger panel's keys is computed from
+    that panel's (already small) table, which then also carries the
+    child's measures.
+    """
+    bases = {}
+    children = {}
+    for name in sorted(panels, key=lambda n: -len(panels[n][0])):
+        keys, measures = panels[name]
+        parent = next((b for b in bases if set(keys) <= set(bases[b][0])), None)
+        if parent is None:
+            bases[name] = (list(keys), list(measures))
+            children[name] = {}
+        else:
+            base_measures = bases[parent][1]
+            base_measures.extend(m for m in measures if m not in base_measures)
+            children[parent][name] = (keys, measures)
+    return bases, children
+
+
+def _scan(frame, keys, measures):
+    """``frame.groupby(keys, dropna=False)[measures].sum()`` with bincount over factorized keys.
+
+    Missing key values form groups of their own, so a table rolled up from
+    this one still counts rows whose other keys are missing.
+    """
+    factorized = [_factorize(frame[key]) for key in keys]
+    # shift the codes by one, so -1 (missing) gets the first bucket of its key
+    codes = [f[0] + 1 for f in factorized]
+    sizes = [len(f[1]) + 1 for f in factorized]
+    group = np.ravel_multi_index(codes, sizes) if len(codes[0]) else np.empty(0, dtype=np.intp)
+    n_groups = int(np.prod(sizes, dtype=np.int64))
+    observed = None
+    if n_groups > MAX_DENSE_GROUPS:
+        observed, group = np.unique(group, return_inverse=True)
+        n_groups = len(observed)
+
+    counts = np.bincount(group, minlength=n_groups)
+    present = np.flatnonzero(counts)
+    flat = present if observed is None else observed[present]
+
+    table = {}
+    for key, key_codes, (_, uniques) in zip(keys, np.unravel_index(flat, sizes), factorized):
+        table[key] = _decode(key_codes - 1, uniques, frame[key].dtype)
+    for measure in measures:
+        if measure in frame.columns:
+            weights = frame[measure].to_numpy(dtype=np.float64)
+            table[measure] = np.bincount(group, weights=weights, minlength=n_groups)[present]
+        else:
+            # raw order lines: each row is one line
+            table[measure] = counts[present]
+    return pd.DataFrame(table)
+
+
+def aggregate(frame, panels=FILTERED_PANELS):
+    """Compute ``{panel: groupby(keys)[measures].sum()}`` for every panel in ``panels``.
+
+    Only panels whose keys are not covered by a larger panel scan ``frame``;
+    the rest are rolled up from those results.
+    """
+    bases, children = plan(panels)
+    tables = {}
+    for name, (keys, measures) in bases.items():
+        table = _scan(frame, keys, measures)
+        tables[name] = panel_table(table, panels[name])
+        if children[name]:
+            tables.update(aggregate(table, children[name]).tables)
+    return PanelAggregates({name: tables[name] for name in panels})
+
+
+def panel_table(table, panel):
+    """The columns of ``panel`` from a base table, without the groups missing one of its keys.
+
+    Only the panel's own keys count: the base table keeps its missing-key
+    groups for the children rolled up from it.
+    """
+    keys, measures = panel
+    table = table[list(keys) + list(measures)]
+    return table.dropna(subset=list(keys), ignore_index=True)
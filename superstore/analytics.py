@@ -0,0 +1,66 @@
+"""The dashboard's analyses as plain functions of a backend, without Streamlit.
+
+The dashboard script lays these tables out with ``st.*`` calls; the batch
+reports in ``superstore.batch`` write the same tables to files. Every
+function takes a backend (``FrameBackend`` or ``SqlBackend``) or the panel
+tables it returned, so both run against either kind of data source.
+"""
+import pandas as pd
+
+from superstore.cube import LINES
+
+# panel name -> (key columns, measures) of the tables in a report; unlike the
+# dashboard's top-10 tables these honour the Region/State/City selection
+REPORT_PANELS = {
+    "category": (["Category"], ["Sales", "Profit"]),
+    "state": (["State"], ["Sales", "Profit"]),
+    "city": (["City"], ["Sales", "Profit"]),
+    "discount": (["Discount"], ["Sales", "Profit"]),
+    "state_city": (["State", "City"], ["Profit"]),
+    "ship_mode": (["Ship Mode"], [LINES, "Profit"]),
+    "segment": (["Segment"], ["Sales", "Profit"]),
+}
+TOP_N = 10
+
+
+def top(table, n=TOP_N, by="Sales"):
+    """The ``n`` rows of ``table`` with the largest ``by``."""
+    return table.nlargest(n, by)
+
+
+def consistent_losses(panels):
+    """States/cities whose profit over the selection is negative."""
+    state_city = panels["state_city"]
+    return state_city[state_city["Profit"] < 0]
+
+
+def ship_mode_counts(panels):
+    """Order lines per ship mode, most used first."""
+    counts = panels["ship_mode"][["Ship Mode", LINES]].sort_values(LINES, ascending=False)
+    counts.columns = ["Ship Mode", "Count"]
+    return counts
+
+
+def ship_mode_profit(panels):
+    return panels["ship_mode"][["Ship Mode", "Profit"]]
+
+
+def kpis(totals):
+    """The KPI totals of ``backend.totals`` as a one-row table."""
+    return pd.DataFrame([{name: totals[name] for name in ("Sales", "Profit", "Orders", "Lines")}])
+
+
+def report(backend, start, end, selections=None):
+    """Every table of a report on the orders dated ``start``..``end`` matching ``selections``."""
+    panels = backend.panels(start, end, selections, REPORT_PANELS)
+    return {
+        "kpis": kpis(backend.totals(start, end, selections)),
+        "top_states": top(panels["state"]),
+        "top_cities": top(panels["city"]),
+        "top_categories": top(panels["category"]),
+        "discount": panels["discount"],
+        "consistent_losses": consistent_losses(panels),
+        "ship_mode_counts": ship_mode_counts(panels),
+        "ship_mode_profit": ship_mode_profit(panels),
+        "segment": panels["segment"],
+    }
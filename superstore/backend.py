@@ -0,0 +1,144 @@
+"""Query interface between the dashboard and where the data lives.
+
+The dashboard only asks a backend questions about a date window and a
+Region/State/City selection: the date bounds, the KPI totals, the values
+offered by a filter, the panel tables and a few row-level result sets.
+``FrameBackend`` answers them from a DataFrame returned by the loader,
+using the date index, filter index and sales cube built for it;
+``superstore.sql.SqlBackend`` compiles the same questions to SQL and runs
+them inside an embedded database.
+
+Row-level conditions are ``(column, operator, value)`` tuples, with the
+operators in ``OPERATORS``, so both backends can apply them.
+"""
+import operator
+
+import numpy as np
+
+from superstore import profiling
+from superstore.aggregate import FILTERED_PANELS, aggregate
+from superstore.cube import SalesCube
+from superstore.dates import DateIndex
+from superstore.filters import FilterIndex, take
+from superstore.loader import DASHBOARD_COLUMNS, derived, source_key
+from superstore.pages import FramePager
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "=": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def selection_key(selections):
+    """Hashable form of a ``{column: values}`` selection."""
+    return tuple((column, tuple(values)) for column, values in sorted((selections or {}).items()))
+
+
+def _build(name, factory, df):
+    with profiling.stage(name, len(df)):
+        return factory(df)
+
+
+class FrameBackend:
+    """Backend over a loaded, Order Date sorted DataFrame.
+
+    The indexes and the cube are shared by every backend over the same frame
+    (see ``loader.derived``); the backend itself is cheap and is created
+    again on every rerun.
+    """
+
+    def __init__(self, df):
+        self.frame = df
+        self.key = source_key(df)
+        self.dates = derived(df, "date_index", lambda: _build("build date index", DateIndex, df))
+        self.cube = derived(df, "cube", lambda: _build("build sales cube", SalesCube.build, df))
+        self.index = derived(df, "filter_index", lambda: _build("build filter index", FilterIndex, df))
+        # row-level results only carry the columns the panels show, like SqlBackend's
+        self.row_columns = [c for c in DASHBOARD_COLUMNS if c in df.columns]
+        # the same window and selection are asked for several times per rerun
+        self._windows = {}
+        self._masks = {}
+
+    @property
+    def first(self):
+        return self.dates.first
+
+    @property
+    def last(self):
+        return self.dates.last
+
+    def _window(self, start, end):
+        """Row slice and rows of the orders dated ``start``..``end``."""
+        key = (start, end)
+        if key not in self._windows:
+            window = self.dates.window(start, end)
+            self._windows[key] = (window, self.frame.iloc[window])
+        return self._windows[key]
+
+    def _filtered(self, start, end, selections):
+        window, rows = self._window(start, end)
+        if not selections or not any(selections.values()):
+            return rows
+        key = (start, end, selection_key(selections))
+        if key not in self._masks:
+            self._masks[key] = take(rows, self.index.mask(selections, window))
+        return self._masks[key]
+
+    def totals(self, start, end, selections=None):
+        """Sales, Profit, distinct orders and order lines of the date window and ``selections``."""
+        if selections and any(selections.values()):
+            rows = self._filtered(start, end, selections)
+            return {
+                "Sales": float(np.nansum(rows["Sales"].to_numpy(dtype="float64"))),
+                "Profit": float(np.nansum(rows["Profit"].to_numpy(dtype="float64"))),
+                "Orders": rows["Order ID"].nunique(),
+                "Lines": len(rows),
+            }
+        _, rows = self._window(start, end)
+        return {
+            "Sales": self.dates.total("Sales", start, end),
+            "Profit": self.dates.total("Profit", start, end),
+            "Orders": rows["Order ID"].nunique(),
+            "Lines": len(rows),
+        }
+
+    def options(self, column, start, end, selections=None):
+        window, _ = self._window(start, end)
+        return self.index.options(column, selections, window)
+
+    def panels(self, start, end, selections=None, panels=FILTERED_PANELS):
+        _, rows = self._window(start, end)
+        return aggregate(self.cube.select(rows, start, end, selections), panels)
+
+    def rows(self, start, end, selections=None, where=(), order_by=None, ascending=False, limit=None):
+        """Order lines of the window matching ``selections`` and the ``where`` conditions, in ``row_columns``.
+
+        With ``order_by`` and ``limit`` this is ``nlargest``/``nsmallest``,
+        so ties keep their row order.
+        """
+        rows = self._filtered(start, end, selections)
+        if where:
+            mask = None
+            for column, op, value in where:
+                condition = OPERATORS[op](rows[column], value)
+                mask = condition if mask is None else mask & condition
+            rows = rows[mask]
+        if order_by is not None and limit is not None:
+            pick = rows.nsmallest if ascending else rows.nlargest
+            rows = pick(limit, order_by)
+        elif order_by is not None:
+            rows = rows.sort_values(order_by, ascending=ascending, kind="stable")
+        elif limit is not None:
+            rows = rows.iloc[:limit]
+        return rows[self.row_columns]
+
+    def pager(self, start=None, end=None, selections=None, where=()):
+        """A pager over the whole dataset, or over the ``rows`` of a window, selection and conditions."""
+        if start is None:
+            return FramePager(self.frame, self.key)
+        key = (self.key, start, end, selection_key(selections), tuple(where))
+        return FramePager(self.rows(start, end, selections, where), key)
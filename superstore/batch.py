@@ -0,0 +1,236 @@
+"""Headless batch reports: the dashboard's analyses for many filter specs at once.
+
+Usage: python -m superstore.batch SPECS [--source FILE | --database PATH] [--output DIR]
+                                        [--format csv parquet html] [--workers N]
+
+``SPECS`` is a JSON file holding a list of filter specs such as::
+
+    [{"name": "west-2017-03", "month": "2017-03", "Region": ["West"]},
+     {"start": "2017-01-01", "end": "2017-06-30", "Region": "East", "State": ["New York"]}]
+
+A spec takes a ``month`` or a ``start``/``end`` date (the whole dataset
+without either) and Region/State/City values, each a string or a list.
+Every spec gets a directory under ``--output``, named after a slug of its
+name (with ``-2``, ``-3``... appended when names slug to the same
+directory), with one CSV and/or Parquet file per table of
+``analytics.report`` and a ``report.html`` page with all of them, plus a
+row in ``index.csv``.
+
+Specs are spread over a process pool. The dataset is loaded, and its date
+index, filter index and cube built, once in the parent before the pool
+starts; on platforms that fork, the workers share those pages with the
+parent instead of loading their own copy. Elsewhere each worker memory-maps
+the columnar cache the parent wrote. With ``--database`` every worker opens
+the database read-only. Workers write their own files and send back only a
+summary, so throughput grows with the number of cores.
+"""
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from superstore import analytics, charts
+from superstore.backend import FrameBackend
+from superstore.export import available_formats, file_name, write_table
+from superstore.loader import DASHBOARD_COLUMNS, DEFAULT_DATASET, load_path
+from superstore.sql import DEFAULT_TABLE, open_database
+
+SELECTION_COLUMNS = ["Region", "State", "City"]
+# --format values -> export format names; HTML is the one page per spec
+FORMATS = {"csv": "CSV", "parquet": "Parquet", "html": "HTML"}
+
+# the data source of this process: a loaded frame, or a database backend
+_source = None
+
+
+class ReportSpec:
+    """One report: a name, a date window (None for the dataset's bounds) and a selection."""
+
+    def __init__(self, name, start, end, selections):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.selections = selections
+
+
+def _values(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def parse_spec(entry, index):
+    """A ``ReportSpec`` from one entry of the specs file."""
+    if "month" in entry:
+        start = pd.Timestamp(f"{entry['month']}-01")
+        end = start + pd.offsets.MonthEnd(0)
+    else:
+        start = pd.Timestamp(entry["start"]) if entry.get("start") else None
+        end = pd.Timestamp(entry["end"]) if entry.get("end") else None
+    selections = {column: _values(entry.get(column)) for column in SELECTION_COLUMNS}
+    name = entry.get("name")
+    if not name:
+        parts = [v for column in SELECTION_COLUMNS for v in selections[column]]
+        parts.append(entry["month"] if "month" in entry else f"{entry.get('start', '')}_{entry.get('end', '')}")
+        name = "_".join(p for p in parts if p.strip("_")) or f"spec-{index}"
+    return ReportSpec(name, start, end, selections)
+
+
+def read_specs(path):
+    with open(path, encoding="utf-8") as handle:
+        entries = json.load(handle)
+    if isinstance(entries, dict):
+        entries = [entries]
+    return [parse_spec(entry, index) for index, entry in enumerate(entries)]
+
+
+def slug(name):
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", name).strip("-") or "report"
+
+
+def directories(specs):
+    """A distinct directory name per spec: its slug, numbered when several names share one."""
+    taken = set()
+    names = []
+    for spec in specs:
+        base = name = slug(spec.name)
+        number = 1
+        # case-insensitive, for file systems that are
+        while name.lower() in taken:
+            number += 1
+            name = f"{base}-{number}"
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+
+def _open(source, database, table):
+    if database:
+        return open_database(database, table)
+    return load_path(source, DASHBOARD_COLUMNS)
+
+
+def _init_worker(source, database, table):
+    global _source
+    _source = _open(source, database, table)
+
+
+def _backend():
+    # a backend per spec, so the per-window memos of a frame backend don't pile up
+    return FrameBackend(_source) if isinstance(_source, pd.DataFrame) else _source
+
+
+def report_html(spec, start, end, tables):
+    """A standalone page with the KPIs, three charts and every table of a report."""
+    # spec names and filter values come from the specs file and go into the page as text
+    title = html.escape(spec.name)
+    selection = html.escape(
+        ", ".join(f"{c}: {', '.join(map(str, v))}" for c, v in spec.selections.items() if v) or "all"
+    )
+    figures = [
+        charts.bar(tables["discount"], x="Discount", y="Profit", color="Discount", title="Profit by Discount"),
+        charts.bar(tables["ship_mode_profit"], x="Ship Mode", y="Profit", color="Ship Mode",
+                   title="Most Profitable Delivery Way"),
+        charts.bar(tables["segment"], x="Segment", y="Sales", color="Segment", title="Customer Segment Analysis"),
+    ]
+    body = [
+        f"<h1>SuperStore report: {title}</h1>",
+        f"<p>{start:%Y-%m-%d} to {end:%Y-%m-%d}; {selection}</p>",
+    ]
+    for number, figure in enumerate(figures):
+        body.append(figure.to_html(full_html=False, include_plotlyjs="cdn" if number == 0 else False))
+    for name, table in tables.items():
+        body.append(f"<h2>{name.replace('_', ' ').capitalize()}</h2>")
+        body.append(table.to_html(index=False, float_format=lambda v: f"{v:,.2f}", border=0))
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title></head>"
+            f"<body>{''.join(body)}</body></html>")
+
+
+def run_spec(spec, directory, formats):
+    """Compute one report and write its files to ``directory``; returns its row of ``index.csv``."""
+    started = time.perf_counter()
+    backend = _backend()
+    start = spec.start if spec.start is not None else backend.first
+    end = spec.end if spec.end is not None else backend.last
+    tables = analytics.report(backend, start, end, spec.selections)
+
+    os.makedirs(directory, exist_ok=True)
+    for fmt in formats:
+        if fmt == "HTML":
+            with open(os.path.join(directory, "report.html"), "w", encoding="utf-8") as sink:
+                sink.write(report_html(spec, start, end, tables))
+            continue
+        for name, table in tables.items():
+            with open(os.path.join(directory, file_name(name, fmt)), "wb") as sink:
+                write_table(table, sink, fmt)
+
+    kpis = tables["kpis"].to_dict("records")[0]
+    return {
+        "name": spec.name, "start": start.date().isoformat(), "end": end.date().isoformat(),
+        **{c: ";".join(map(str, v)) for c, v in spec.selections.items()},
+        "Sales": kpis["Sales"], "Profit": kpis["Profit"], "Orders": kpis["Orders"], "Lines": kpis["Lines"],
+        "seconds": round(time.perf_counter() - started, 4), "directory": directory,
+    }
+
+
+def run(specs, output, formats, source=DEFAULT_DATASET, database=None, table=DEFAULT_TABLE, workers=None):
+    """Write the reports of ``specs`` under ``output`` and return the rows of ``index.csv``."""
+    global _source
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    workers = max(1, min(workers, len(specs)))
+    os.makedirs(output, exist_ok=True)
+
+    fork = "fork" in multiprocessing.get_all_start_methods()
+    if database is None or workers == 1:
+        # load and index once here; forked workers inherit it, others read the columnar cache
+        _source = _open(source, database, table)
+        if database is None:
+            FrameBackend(_source)
+    paths = [os.path.join(output, name) for name in directories(specs)]
+    if workers == 1:
+        rows = [run_spec(spec, path, formats) for spec, path in zip(specs, paths)]
+    else:
+        shared = fork and database is None
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork" if shared else None),
+            initializer=None if shared else _init_worker,
+            initargs=() if shared else (source, database, table),
+        )
+        with pool:
+            rows = list(pool.map(run_spec, specs, paths, [formats] * len(specs)))
+    pd.DataFrame(rows).to_csv(os.path.join(output, "index.csv"), index=False)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the dashboard's report tables for many filter specs.")
+    parser.add_argument("specs", help="JSON file with a list of filter specs")
+    parser.add_argument("--source", default=DEFAULT_DATASET, help="CSV or Excel file (default: the bundled dataset)")
+    parser.add_argument("--database", help="DuckDB or SQLite file to query instead of loading a file")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--output", default="reports", help="directory for the reports")
+    parser.add_argument("--format", nargs="+", choices=sorted(FORMATS), default=["csv", "html"], dest="formats")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per available core)")
+    args = parser.parse_args()
+
+    formats = [FORMATS[f] for f in args.formats]
+    missing = [f for f in formats if f != "HTML" and f not in available_formats()]
+    if missing:
+        parser.error(f"{', '.join(missing)} output needs a package that is not installed")
+    specs = read_specs(args.specs)
+    started = time.perf_counter()
+    rows = run(specs, args.output, formats, args.source, args.database, args.table, args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {len(rows)} reports to {args.output} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Small in-process caches shared by the dashboard modules."""
+import hashlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock, RLock
+
+_MISSING = object()
+
+
+class KeyLocks:
+    """One lock per key, for building a value once without blocking lookups of other keys.
+
+    A cache holds its own lock only to look up and insert; the build runs
+    under ``lock(key)``, so two sessions asking for the same missing value
+    build it once, while a session asking for anything else goes ahead.
+    Locks exist only while someone holds or waits for them.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def lock(self, key):
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [RLock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
+class LRUCache:
+    """A thread-safe mapping that evicts the least recently used entry.
+
+    Streamlit reruns the page script on every widget interaction but keeps
+    imported modules alive, so a module-level ``LRUCache`` survives reruns
+    and is shared by every session served by the same process.
+    """
+
+    def __init__(self, max_entries):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = RLock()
+        self._builds = KeyLocks()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        """Return the cached value for ``key``, building it with ``factory`` on a miss.
+
+        Concurrent misses on the same key build it once; the cache stays
+        usable for other keys while ``factory`` runs.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._builds.lock(key):
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = factory()
+                self.put(key, value)
+            return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SessionCache:
+    """A thread-safe mapping whose entries are kept for as long as a session uses them.
+
+    Each session holds at most one entry, the one it last asked for. An
+    entry nobody holds any more becomes idle, and only the ``max_idle``
+    most recently released idle entries are kept, so a value used by many
+    sessions exists once and is dropped soon after the last of them
+    leaves. Lookups without a session never hold an entry.
+    """
+
+    def __init__(self, max_idle):
+        if max_idle < 0:
+            raise ValueError("max_idle must not be negative")
+        self.max_idle = max_idle
+        self._entries = {}
+        self._holders = {}
+        self._held = {}
+        # idle keys, least recently released first
+        self._idle = OrderedDict()
+        self._lock = RLock()
+        self._builds = KeyLocks()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def holders(self, key):
+        """Number of sessions holding ``key``."""
+        return len(self._holders.get(key, ()))
+
+    def get_or_create(self, key, factory, session=None):
+        """Return the value for ``key``, building it with ``factory`` on a miss, held by ``session``.
+
+        Like ``LRUCache.get_or_create``, ``factory`` runs outside the cache's
+        lock and at most once at a time per key.
+        """
+        value = self._lookup(key, session)
+        if value is not _MISSING:
+            return value
+        with self._builds.lock(key):
+            value = self._lookup(key, session)
+            if value is _MISSING:
+                value = factory()
+                with self._lock:
+                    if key not in self._entries:
+                        self._entries[key] = value
+                        self._idle[key] = None
+                    self._use(key, session)
+                    value = self._entries[key]
+            return value
+
+    def _lookup(self, key, session):
+        with self._lock:
+            if key not in self._entries:
+                return _MISSING
+            self._use(key, session)
+            return self._entries[key]
+
+    def _use(self, key, session):
+        if session is not None:
+            self._hold(session, key)
+        elif key in self._idle:
+            self._idle.move_to_end(key)
+        self._evict()
+
+    def _hold(self, session, key):
+        previous = self._held.get(session)
+        if previous == key:
+            return
+        self._held[session] = key
+        self._holders.setdefault(key, set()).add(session)
+        self._idle.pop(key, None)
+        if previous is not None:
+            self._drop_holder(previous, session)
+
+    def _drop_holder(self, key, session):
+        holders = self._holders.get(key)
+        if holders is None:
+            return
+        holders.discard(session)
+        if not holders:
+            del self._holders[key]
+            if key in self._entries:
+                self._idle[key] = None
+
+    def _evict(self):
+        while len(self._idle) > self.max_idle:
+            key, _ = self._idle.popitem(last=False)
+            self._entries.pop(key, None)
+
+    def release(self, session):
+        """Stop holding the entry ``session`` holds, if any."""
+        with self._lock:
+            key = self._held.pop(session, None)
+            if key is not None:
+                self._drop_holder(key, session)
+                self._evict()
+
+    def release_inactive(self, is_active):
+        """Release every session for which ``is_active(session)`` is false."""
+        with self._lock:
+            for session in [s for s in self._held if not is_active(s)]:
+                self.release(session)
+
+    def clear(self):
+        """Drop every entry; sessions holding one will build it again on their next lookup."""
+        with self._lock:
+            self._entries.clear()
+            self._holders.clear()
+            self._held.clear()
+            self._idle.clear()
+
+
+def make_key(*parts):
+    """Stable hash of ``parts`` (strings, numbers, timestamps and containers of them)."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+MAX_PANEL_RESULTS = 256
+# dashboard section results (tables, figures, CSV bytes) keyed by (section, filter key)
+panel_results = LRUCache(MAX_PANEL_RESULTS)
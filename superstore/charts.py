@@ -0,0 +1,174 @@
+"""Chart data: bounded figure payloads built from aggregated tables.
+
+Plotly sends every point of a figure to the browser, so a chart is only
+ever built from a table grouped by its own keys, never from order lines.
+Where a grouping has more labels than a chart can usefully show, the
+smallest ones are folded into an ``"Other"`` bar, slice or tile, so the
+size of a figure depends on these budgets rather than on the dataset.
+
+Treemaps are built from node lists computed here instead of with
+``px.treemap``, which rebuilds every level with per-group Python code and
+takes the better part of a second for a Region/State/City/Category tree.
+Tiles are coloured like ``px.treemap(..., color=value)`` does: a parent gets
+the value-weighted mean of its leaves' values.
+
+Built figures are cached by (chart, filter key); ``st.plotly_chart`` then
+only serializes a figure that already exists.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from superstore.cache import LRUCache
+
+OTHER = "Other"
+MAX_BARS = 30
+MAX_SLICES = 12
+MAX_TREEMAP_LEAVES = 500
+MAX_CACHED_FIGURES = 64
+
+_figures = LRUCache(MAX_CACHED_FIGURES)
+
+
+def cached(chart, key, build):
+    """The figure of ``chart`` for the filter state ``key``, built by ``build`` on a miss."""
+    return _figures.get_or_create((chart, key), build)
+
+
+def clear_cache():
+    _figures.clear()
+
+
+def summarize(table, keys, measures):
+    """``table`` grouped by ``keys`` with ``measures`` summed, in first-seen order."""
+    return table.groupby(keys, observed=True, sort=False)[measures].sum().reset_index()
+
+
+def collapse_tail(table, label, measures, limit):
+    """The ``limit - 1`` largest rows by the first measure, plus one ``"Other"`` row summing the rest.
+
+    Rows are ranked by absolute value, so large losses are kept as well as
+    large gains. Tables of at most ``limit`` rows are returned unchanged.
+    """
+    if len(table) <= limit:
+        return table
+    ranked = table[measures[0]].abs().to_numpy().argsort(kind="stable")[::-1]
+    keep = np.sort(ranked[:limit - 1])
+    rest = np.sort(ranked[limit - 1:])
+    head = table.iloc[keep].astype({label: object})
+    other = pd.DataFrame({label: [OTHER], **{m: [table[m].iloc[rest].sum()] for m in measures}})
+    return pd.concat([head, other], ignore_index=True)
+
+
+def bar(table, x, y, limit=MAX_BARS, **kwargs):
+    """``px.bar`` of ``y`` summed per ``x``, with at most ``limit`` bars."""
+    data = collapse_tail(summarize(table, [x], [y]), x, [y], limit)
+    return px.bar(data, x=x, y=y, **kwargs)
+
+
+def pie(table, names, values, limit=MAX_SLICES, **kwargs):
+    """``px.pie`` of ``values`` summed per ``names``, with at most ``limit`` slices."""
+    data = collapse_tail(summarize(table, [names], [values]), names, [values], limit)
+    return px.pie(data, names=names, values=values, **kwargs)
+
+
+def _prefix_ids(leaves, path):
+    """Per level ``j``, a group number per leaf for its first ``j`` path labels."""
+    ids = [np.zeros(len(leaves), dtype=np.int64)]
+    for depth in range(1, len(path)):
+        ids.append(leaves.groupby(path[:depth], observed=True, sort=False).ngroup().to_numpy())
+    return ids
+
+
+def _fold_depths(prefix_ids, kept):
+    """Per leaf, how many of its path labels survive: all for a kept leaf,
+    otherwise those of its deepest ancestor that still has a kept leaf below it.
+    """
+    depths = np.where(kept, len(prefix_ids), 0)
+    for depth in range(1, len(prefix_ids)):
+        ids = prefix_ids[depth]
+        has_kept = np.bincount(ids, weights=kept)[ids] > 0
+        depths[has_kept & ~kept] = depth
+    return depths
+
+
+def _leaf_count(prefix_ids, kept):
+    depths = _fold_depths(prefix_ids, kept)
+    dropped = ~kept
+    if not dropped.any():
+        return int(kept.sum())
+    ids = np.stack(prefix_ids)[depths[dropped], np.flatnonzero(dropped)]
+    buckets = np.unique(depths[dropped] * (len(kept) + 1) + ids)
+    return int(kept.sum()) + len(buckets)
+
+
+def cap_leaves(leaves, path, value, budget=MAX_TREEMAP_LEAVES):
+    """Fold the smallest leaves of a hierarchy into ``"Other"`` tiles until at most ``budget`` remain.
+
+    The largest leaves are kept. A dropped leaf goes to an ``"Other"`` child
+    of its deepest ancestor that still shows a kept leaf, so small cities
+    become one "Other" under their state and small states one "Other" under
+    their region. Path labels below an ``"Other"`` are ``None``.
+    """
+    if len(leaves) <= budget:
+        return leaves
+    leaves = leaves.reset_index(drop=True)
+    prefix_ids = _prefix_ids(leaves, path)
+    rank = np.empty(len(leaves), dtype=np.int64)
+    rank[leaves[value].abs().to_numpy().argsort(kind="stable")[::-1]] = np.arange(len(leaves))
+
+    # the largest number of kept leaves whose folded tree fits the budget
+    low, high = 0, budget
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _leaf_count(prefix_ids, rank < middle) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    kept = rank < low
+    depths = _fold_depths(prefix_ids, kept)
+
+    labels = {}
+    for level, column in enumerate(path):
+        values = leaves[column].astype(object).to_numpy(copy=True)
+        values[depths == level] = OTHER
+        values[depths < level] = None
+        labels[column] = values
+    folded = pd.DataFrame({**labels, value: leaves[value].to_numpy()})
+    return folded.groupby(path, dropna=False, sort=False)[value].sum().reset_index()
+
+
+def treemap_nodes(leaves, path, value):
+    """Ids, labels, parents, values and colours of every node above ``leaves``."""
+    weights = leaves[value].to_numpy(dtype=float)
+    parents = pd.Series("", index=leaves.index)
+    levels = []
+    for level, column in enumerate(path):
+        present = leaves[column].notna().to_numpy()
+        labels = leaves[column].astype(str)
+        ids = labels if level == 0 else parents + "/" + labels
+        nodes = pd.DataFrame({
+            "id": ids[present], "parent": parents[present], "label": labels[present],
+            "value": weights[present], "weight": weights[present] ** 2,
+        }).groupby(["id", "parent", "label"], sort=False).sum().reset_index()
+        levels.append(nodes)
+        parents = ids
+    nodes = pd.concat(levels, ignore_index=True)
+    totals = nodes["value"].to_numpy()
+    nodes["color"] = np.divide(nodes["weight"].to_numpy(), totals, out=totals.copy(), where=totals != 0)
+    return nodes.drop(columns="weight")
+
+
+def treemap(table, path, value, title=None, budget=MAX_TREEMAP_LEAVES):
+    """Treemap of ``value`` summed over ``path``, with at most ``budget`` leaf tiles."""
+    leaves = cap_leaves(summarize(table, path, [value]), path, value, budget)
+    nodes = treemap_nodes(leaves, path, value)
+    figure = go.Figure(go.Treemap(
+        ids=nodes["id"], labels=nodes["label"], parents=nodes["parent"], values=nodes["value"],
+        branchvalues="total", marker={"colors": nodes["color"], "coloraxis": "coloraxis"},
+        hovertemplate=f"%{{label}}<br>{value}=%{{value}}<extra></extra>",
+    ))
+    figure.update_layout(title=title, coloraxis={"colorbar": {"title": {"text": value}}},
+                         margin={"t": 60, "l": 25, "r": 25, "b": 25})
+    return figure
@@ -0,0 +1,89 @@
+"""Pre-aggregated sales cube answering the dashboard's groupby panels.
+
+The cube holds Sales, Profit, Quantity and order-line sums for every
+combination of the dimensions below and the order month. It is built once
+per loaded dataset; each panel then rolls up the (much smaller) cube slice
+for the current filters instead of regrouping the raw order lines.
+
+The date pickers work at day granularity, so months only partly covered by
+the selected window are aggregated from the raw rows of those months and
+merged into the slice; whole months come straight from the cube.
+"""
+import pandas as pd
+
+DIMENSIONS = ["Region", "State", "City", "Category", "Sub-Category", "Segment", "Ship Mode", "Discount"]
+MONTH = "Month"
+MEASURES = ["Sales", "Profit", "Quantity"]
+# number of order lines in a cell
+LINES = "Lines"
+
+
+def _month_start(dates):
+    return dates.dt.to_period("M").dt.to_timestamp()
+
+
+def aggregate_cells(rows):
+    """Aggregate raw order lines into cube cells.
+
+    Lines missing a dimension value get cells of their own, so they still
+    count in every panel that is not keyed on that dimension.
+    """
+    keys = [c for c in DIMENSIONS if c in rows.columns]
+    grouped = rows.assign(**{MONTH: _month_start(rows["Order Date"])}).groupby(
+        keys + [MONTH], observed=True, sort=False, dropna=False
+    )
+    cells = grouped[[c for c in MEASURES if c in rows.columns]].sum()
+    cells[LINES] = grouped.size()
+    return cells.reset_index()
+
+
+def _isin_filters(frame, filters):
+    """Boolean mask of rows matching every non-empty ``{column: values}`` selection."""
+    mask = pd.Series(True, index=frame.index)
+    for column, values in filters.items():
+        if values:
+            mask &= frame[column].isin(values)
+    return mask
+
+
+class SalesCube:
+    """Sums by Region x State x City x Category x Sub-Category x Segment x Ship Mode x Discount x month."""
+
+    def __init__(self, cells):
+        self.cells = cells
+        self._month_starts = cells[MONTH]
+        self._next_months = self._month_starts + pd.DateOffset(months=1)
+
+    @classmethod
+    def build(cls, df):
+        return cls(aggregate_cells(df))
+
+    def select(self, rows, start, end, filters=None):
+        """Cube cells for orders dated ``start``..``end`` (inclusive) matching ``filters``.
+
+        ``rows`` holds the raw order lines of that date window, sorted by
+        Order Date; only its lines in months the window covers partially are
+        aggregated.
+        """
+        filters = filters or {}
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        whole = (self._month_starts >= start) & (self._next_months <= end + pd.Timedelta(days=1))
+        cells = self.cells[whole & _isin_filters(self.cells, filters)]
+
+        # order lines outside the whole months sit at the two ends of the sorted window
+        if whole.any():
+            dates = rows["Order Date"]
+            head = dates.searchsorted(self._month_starts[whole].min(), "left")
+            tail = dates.searchsorted(self._next_months[whole].max(), "left")
+            edge_rows = pd.concat([rows.iloc[:head], rows.iloc[tail:]])
+        else:
+            edge_rows = rows
+        edge_rows = edge_rows[_isin_filters(edge_rows, filters)]
+        if not edge_rows.empty:
+            cells = pd.concat([cells, aggregate_cells(edge_rows)], ignore_index=True)
+        return cells
+
+
+def rollup(cells, by, values):
+    """Sum ``values`` over cube ``cells`` grouped by ``by``, like ``groupby(by)[values].sum()``."""
+    return cells.groupby(by, as_index=False, observed=True)[values].sum()
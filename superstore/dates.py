@@ -0,0 +1,60 @@
+"""Order Date index over a dataset kept sorted by Order Date.
+
+The loader stores every dataset sorted by Order Date, so any Start/End Date
+window is a contiguous block of rows found with two binary searches. The
+index also keeps the date bounds and running Sales/Profit totals per distinct
+order date, so the KPI totals of any window cost O(log n) as well.
+"""
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = "Order Date"
+TOTAL_MEASURES = ["Sales", "Profit"]
+
+
+class DateIndex:
+    """Binary-search index over the sorted Order Date column of one dataset."""
+
+    def __init__(self, df):
+        dates = df[DATE_COLUMN].to_numpy()
+        # missing dates sort last and never fall inside a window
+        n_valid = len(dates) - int(np.isnat(dates).sum())
+        dates = dates[:n_valid]
+        if n_valid and (dates[1:] < dates[:-1]).any():
+            raise ValueError("dataset must be sorted by Order Date")
+
+        self.keys, starts = np.unique(dates, return_index=True)
+        # rows of the i-th distinct date are bounds[i]:bounds[i + 1]
+        self._bounds = np.append(starts, n_valid)
+        self._prefix = {}
+        for measure in TOTAL_MEASURES:
+            if measure in df.columns:
+                # missing values count as zero, like in df[measure].sum() and SQL's SUM
+                values = np.nan_to_num(df[measure].to_numpy(dtype=np.float64)[:n_valid])
+                per_date = np.add.reduceat(values, starts) if n_valid else values
+                self._prefix[measure] = np.concatenate([[0.0], np.cumsum(per_date)])
+
+    @property
+    def first(self):
+        return pd.Timestamp(self.keys[0]) if len(self.keys) else pd.NaT
+
+    @property
+    def last(self):
+        return pd.Timestamp(self.keys[-1]) if len(self.keys) else pd.NaT
+
+    def _positions(self, start, end):
+        # positions in ``keys`` of the first date >= start and the first date > end
+        lo = np.searchsorted(self.keys, pd.Timestamp(start).to_datetime64().astype(self.keys.dtype), "left")
+        hi = np.searchsorted(self.keys, pd.Timestamp(end).to_datetime64().astype(self.keys.dtype), "right")
+        return lo, max(lo, hi)
+
+    def window(self, start, end):
+        """Row slice of the orders dated ``start``..``end`` inclusive."""
+        lo, hi = self._positions(start, end)
+        return slice(int(self._bounds[lo]), int(self._bounds[hi]))
+
+    def total(self, measure, start, end):
+        """Sum of ``measure`` over the orders dated ``start``..``end`` inclusive."""
+        lo, hi = self._positions(start, end)
+        prefix = self._prefix[measure]
+        return float(prefix[hi] - prefix[lo])
@@ -0,0 +1,270 @@
+"""Incremental cleaning of the raw Superstore export.
+
+``clean`` turns raw rows of `` Superstore.csv`` into the rows of
+``cleaned_superstore.csv``: dates parsed, plus the derived Order Month,
+Order Year, Discount Range, Profit per Unit and Delivery Time columns, all
+computed column-wise.
+
+``refresh`` keeps a cleaned columnar store of a raw file up to date. The
+store is a directory of Arrow IPC parts next to the columnar cache, plus a
+watermark recording how far into the raw file it has got: the byte offset,
+a hash of the first and last few KiB before it, the last Row ID and the
+last Order Date. When rows are appended to the raw file only the bytes
+past the offset are parsed and cleaned, and they become a new part;
+nothing already in the store is read or rewritten. If the raw file was
+rewritten rather than appended to, its header or the hashed bytes no
+longer match and the store is rebuilt (an edit elsewhere in an unchanged
+prefix goes unnoticed; ``python -m superstore.etl --rebuild`` forces a
+rebuild). Parts are merged into one once there are more than
+``MAX_PARTS``.
+
+``load`` refreshes the store and returns it as a typed frame, cached by
+the loader like any other source. Without pyarrow there is no store, and
+``load`` cleans the whole raw file instead.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+from threading import RLock
+
+import numpy as np
+import pandas as pd
+
+from superstore import loader, profiling, storage
+from superstore.ingest import DEFAULT_CHUNK_ROWS
+from superstore.schema import CSV_ENCODING, compact, csv_dtypes, parse_dates, sort_by_order_date
+
+RAW_DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), " Superstore.csv")
+STORE_VERSION = 1
+# right-closed, so a Discount of 0 falls outside every range and is left empty
+DISCOUNT_BINS = [0, 0.1, 0.2, 0.3, 0.5, 0.7, 1.0]
+DISCOUNT_RANGES = [f"({float(low)}, {float(high)}]" for low, high in zip(DISCOUNT_BINS, DISCOUNT_BINS[1:])]
+DERIVED_COLUMNS = ["Order Month", "Order Year", "Discount Range", "Profit per Unit", "Delivery Time"]
+MAX_PARTS = 8
+# bytes at each end of the processed prefix that must be unchanged for an incremental refresh
+SAMPLE_BYTES = 4096
+
+_lock = RLock()
+
+
+def derive(df):
+    """Add the derived columns to ``df``, whose dates are already parsed."""
+    df["Order Month"] = df["Order Date"].dt.month.astype("Int64")
+    df["Order Year"] = df["Order Date"].dt.year.astype("Int64")
+    ranges = pd.cut(df["Discount"], DISCOUNT_BINS, labels=DISCOUNT_RANGES, right=True)
+    # astype("str") keeps missing values missing only since pandas 3; older versions write "nan"
+    df["Discount Range"] = ranges.astype("str").where(ranges.notna())
+    quantity = df["Quantity"].astype("float64").replace(0, np.nan)
+    df["Profit per Unit"] = df["Profit"] / quantity
+    df["Delivery Time"] = (df["Ship Date"] - df["Order Date"]).dt.days.astype("Int64")
+    return df
+
+
+def clean(raw):
+    """The cleaned rows of a chunk of the raw export."""
+    return derive(parse_dates(raw))
+
+
+def store_dir(raw):
+    """Directory of the cleaned store of the raw file ``raw``."""
+    digest = hashlib.sha256(os.path.abspath(raw).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(storage.CACHE_DIR, f"etl-{digest}")
+
+
+def _watermark_path(directory):
+    return os.path.join(directory, "watermark.json")
+
+
+def read_watermark(directory):
+    """The watermark of the store in ``directory``, or None if there is no usable one."""
+    try:
+        with open(_watermark_path(directory), encoding="utf-8") as handle:
+            watermark = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    return watermark if watermark.get("version") == STORE_VERSION else None
+
+
+def _write_watermark(directory, watermark):
+    path = _watermark_path(directory)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(watermark, handle, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _fingerprint(handle, offset):
+    """Hash of the first and last ``SAMPLE_BYTES`` of the file's first ``offset`` bytes."""
+    digest = hashlib.sha256()
+    handle.seek(0)
+    digest.update(handle.read(min(offset, SAMPLE_BYTES)))
+    handle.seek(max(offset - SAMPLE_BYTES, 0))
+    digest.update(handle.read(min(offset, SAMPLE_BYTES)))
+    return digest.hexdigest()
+
+
+class _Window(io.RawIOBase):
+    """The next ``size`` bytes of ``handle``, so rows appended while reading are left for the next refresh."""
+
+    def __init__(self, handle, size):
+        self.handle = handle
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.handle.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def _read_parts(directory, names, columns=None):
+    return storage.read_parts([os.path.join(directory, name) for name in names], columns)
+
+
+def _merge_parts(directory, watermark):
+    """Replace the store's parts by one, so reads open a single file."""
+    names = watermark["parts"]
+    name = f"part-{watermark['next_part']:05d}.arrow"
+    storage.write_arrow(_read_parts(directory, names), os.path.join(directory, name))
+    watermark["parts"] = [name]
+    watermark["next_part"] += 1
+    _write_watermark(directory, watermark)
+    for old in names:
+        os.remove(os.path.join(directory, old))
+
+
+def _remove_parts(directory):
+    for name in os.listdir(directory):
+        if name.startswith("part-"):
+            os.remove(os.path.join(directory, name))
+
+
+def refresh(raw=RAW_DATASET, chunk_rows=DEFAULT_CHUNK_ROWS, csv_path=None):
+    """Bring the cleaned store of ``raw`` up to date and return its watermark.
+
+    Returns at once if the raw file is unchanged since the last refresh.
+    With ``csv_path``, the newly cleaned rows are also appended to that CSV
+    file, which is rewritten whenever the store is rebuilt.
+    """
+    with _lock:
+        directory = store_dir(raw)
+        watermark = read_watermark(directory)
+        stat = os.stat(raw)
+        if watermark is not None and (watermark["size"], watermark["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return watermark
+
+        with open(raw, "rb") as handle, profiling.stage("etl: refresh") as record:
+            header = handle.readline()
+            header_text = header.decode(CSV_ENCODING)
+            appended = (
+                watermark is not None
+                and watermark["header"] == header_text
+                and watermark["offset"] <= stat.st_size
+                and watermark["fingerprint"] == _fingerprint(handle, watermark["offset"])
+            )
+            if not appended:
+                os.makedirs(directory, exist_ok=True)
+                _remove_parts(directory)
+                watermark = {
+                    "version": STORE_VERSION, "source": os.path.abspath(raw), "header": header_text,
+                    "offset": len(header), "fingerprint": None, "rows": 0, "last_row_id": None,
+                    "last_order_date": None, "parts": [], "next_part": 0, "added": 0,
+                }
+            offset = watermark["offset"]
+            handle.seek(offset)
+            columns = pd.read_csv(io.BytesIO(header), encoding=CSV_ENCODING, nrows=0).columns
+            reader = pd.read_csv(io.BufferedReader(_Window(handle, stat.st_size - offset)),
+                                 names=columns, header=None, encoding=CSV_ENCODING,
+                                 dtype=csv_dtypes(columns), chunksize=chunk_rows)
+
+            def cleaned_chunks():
+                rewrite_csv = csv_path is not None and (not appended or not os.path.exists(csv_path))
+                for chunk in reader:
+                    # rows at or below the watermark were merged already, e.g. when re-appended
+                    if watermark["last_row_id"] is not None:
+                        chunk = chunk[chunk["Row ID"] > watermark["last_row_id"]]
+                    if chunk.empty:
+                        continue
+                    chunk = clean(chunk)
+                    watermark["rows"] += len(chunk)
+                    watermark["last_row_id"] = int(max(chunk["Row ID"].max(), watermark["last_row_id"] or 0))
+                    last_date = chunk["Order Date"].max()
+                    if pd.notna(last_date):
+                        watermark["last_order_date"] = max(last_date.isoformat(), watermark["last_order_date"] or "")
+                    if csv_path is not None:
+                        chunk.to_csv(csv_path, mode="w" if rewrite_csv else "a", header=rewrite_csv,
+                                     index=False, encoding=CSV_ENCODING, date_format="%Y-%m-%d")
+                        rewrite_csv = False
+                    yield chunk
+
+            # new parts are cast to the schema of the first, so they concatenate
+            schema = None
+            if watermark["parts"]:
+                schema = storage.read_schema(os.path.join(directory, watermark["parts"][0]))
+            name = f"part-{watermark['next_part']:05d}.arrow"
+            rows, _ = storage.write_chunks(cleaned_chunks(), os.path.join(directory, name), schema)
+            record.rows_out = rows
+            watermark["added"] = rows
+            if rows:
+                watermark["parts"].append(name)
+                watermark["next_part"] += 1
+            watermark.update(offset=stat.st_size, fingerprint=_fingerprint(handle, stat.st_size),
+                             size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        _write_watermark(directory, watermark)
+        if len(watermark["parts"]) > MAX_PARTS:
+            with profiling.stage("etl: merge parts", watermark["rows"]):
+                _merge_parts(directory, watermark)
+        return watermark
+
+
+def load(raw=RAW_DATASET, columns=None, session=None):
+    """The cleaned rows of ``raw``, typed like any frame from the loader, after refreshing its store."""
+    if columns is not None:
+        columns = tuple(columns)
+    if not storage.available():
+        key = loader.path_key(raw)
+
+        def build():
+            df = compact(sort_by_order_date(clean(pd.read_csv(raw, encoding=CSV_ENCODING))))
+            return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+        return loader.cached_frame(f"etl:{key}", columns, build, session)
+
+    watermark = refresh(raw)
+    directory = store_dir(raw)
+    parts = tuple(watermark["parts"])
+
+    def build():
+        with profiling.stage("etl: read store") as record:
+            df = compact(sort_by_order_date(_read_parts(directory, parts, columns)))
+            record.rows_out = len(df)
+        return df
+
+    return loader.cached_frame(f"etl:{directory}:{watermark['rows']}:{parts}", columns, build, session)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the raw Superstore export into the columnar store.")
+    parser.add_argument("raw", nargs="?", default=RAW_DATASET, help="raw Superstore CSV file")
+    parser.add_argument("--csv", help="also write the cleaned rows to this CSV file")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--rebuild", action="store_true", help="discard the store and clean every row again")
+    args = parser.parse_args()
+    if args.rebuild:
+        directory = store_dir(args.raw)
+        if os.path.exists(_watermark_path(directory)):
+            os.remove(_watermark_path(directory))
+    before = read_watermark(store_dir(args.raw))
+    watermark = refresh(args.raw, args.chunk_rows, args.csv)
+    added = 0 if watermark == before else watermark["added"]
+    print(f"{watermark['rows']:,} cleaned rows in {store_dir(args.raw)} ({added:,} new), "
+          f"up to Row ID {watermark['last_row_id']} and Order Date {watermark['last_order_date']}")
+
+
+if __name__ == "__main__":
+    main()
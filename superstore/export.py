@@ -0,0 +1,106 @@
+"""Deferred exports of panel tables.
+
+Download buttons get a callable from ``deferred`` instead of pre-encoded
+bytes, so a file is only built when someone clicks Download. CSV output is
+written in row chunks straight into the output buffer, which avoids holding
+the whole text and its encoded copy at the same time. Finished files are
+cached by (panel, filter key, format), so repeated downloads are free.
+"""
+import io
+import zipfile
+
+from superstore.cache import LRUCache
+
+try:
+    import pyarrow  # noqa: F401  (needed by DataFrame.to_parquet)
+except ImportError:  # pragma: no cover - depends on the environment
+    pyarrow = None
+try:
+    import openpyxl  # noqa: F401  (needed by DataFrame.to_excel)
+except ImportError:  # pragma: no cover - depends on the environment
+    openpyxl = None
+
+CSV_CHUNK_ROWS = 50_000
+MAX_CACHED_EXPORTS = 64
+
+# format -> (file extension, MIME type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+_exports = LRUCache(MAX_CACHED_EXPORTS)
+
+
+def available_formats():
+    formats = ["CSV"]
+    if pyarrow is not None:
+        formats.append("Parquet")
+    if openpyxl is not None:
+        formats.append("Excel")
+    return formats
+
+
+def file_name(name, fmt):
+    return f"{name}.{FORMATS[fmt][0]}"
+
+
+def mime(fmt):
+    return FORMATS[fmt][1]
+
+
+def write_csv(table, sink, chunk_rows=CSV_CHUNK_ROWS):
+    """Write ``table`` as UTF-8 CSV to the binary ``sink``, ``chunk_rows`` rows at a time."""
+    for start in range(0, max(len(table), 1), chunk_rows):
+        chunk = table.iloc[start:start + chunk_rows]
+        sink.write(chunk.to_csv(index=False, header=start == 0).encode("utf-8"))
+
+
+def write_table(table, sink, fmt):
+    if fmt == "CSV":
+        write_csv(table, sink)
+    elif fmt == "Parquet":
+        table.to_parquet(sink, index=False)
+    elif fmt == "Excel":
+        table.to_excel(sink, index=False)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def export_bytes(table, fmt):
+    buffer = io.BytesIO()
+    write_table(table, buffer, fmt)
+    return buffer.getvalue()
+
+
+def zip_bytes(tables, fmt):
+    """A ZIP archive with one file per ``{name: table}`` entry; tables may be callables."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, table in tables.items():
+            if callable(table):
+                table = table()
+            if fmt == "CSV":
+                with archive.open(file_name(name, fmt), "w") as member:
+                    write_csv(table, member)
+            else:
+                # Parquet and Excel writers need a seekable file
+                archive.writestr(file_name(name, fmt), export_bytes(table, fmt))
+    return buffer.getvalue()
+
+
+def deferred(name, filter_key, fmt, table):
+    """A zero-argument callable for ``st.download_button`` that builds the file on click.
+
+    ``table`` may be a DataFrame or a callable returning one.
+    """
+    def build():
+        return export_bytes(table() if callable(table) else table, fmt)
+
+    return lambda: _exports.get_or_create((name, filter_key, fmt), build)
+
+
+def deferred_zip(name, filter_key, fmt, tables):
+    """Like ``deferred`` but for a ZIP of several ``{name: table}`` entries."""
+    return lambda: _exports.get_or_create((name, filter_key, fmt, "zip"), lambda: zip_bytes(tables, fmt))
@@ -0,0 +1,93 @@
+"""Inverted-index filter engine for the sidebar selections.
+
+For each filter column the index stores the row ids of every value, grouped
+by value and sorted within each group (a CSR layout over the categorical
+codes). A selection is answered by scattering the row ids of the selected
+values into a row bitmap (union within a column) and AND-ing the bitmaps of
+the selected columns (intersection across columns), so no intermediate
+DataFrame is built.
+"""
+import numpy as np
+
+FILTER_COLUMNS = ["Region", "State", "City", "Category", "Segment", "Ship Mode"]
+
+
+class FilterIndex:
+    """Per-value row id lists for the filter columns of one loaded dataset."""
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self._codes = {}
+        self._values = {}
+        self._rows = {}
+        self._offsets = {}
+        for column in FILTER_COLUMNS:
+            if column not in df.columns:
+                continue
+            values = df[column].astype("category").cat
+            codes = values.codes.to_numpy()
+            order = np.argsort(codes, kind="stable")
+            # missing values have code -1 and sort first; they never match a selection
+            order = order[codes[order] >= 0]
+            counts = np.bincount(codes[codes >= 0], minlength=len(values.categories))
+            self._codes[column] = codes
+            self._values[column] = values.categories
+            self._rows[column] = order
+            self._offsets[column] = np.concatenate([[0], np.cumsum(counts)])
+
+    def rows(self, column, values):
+        """Sorted row ids whose ``column`` is one of ``values``."""
+        categories = self._values[column]
+        offsets = self._offsets[column]
+        chunks = [
+            self._rows[column][offsets[code]:offsets[code + 1]]
+            for code in categories.get_indexer(list(values))
+            if code >= 0
+        ]
+        if not chunks:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(chunks))
+
+    def _window(self, window):
+        if window is None:
+            return 0, self.n_rows
+        start, stop, _ = window.indices(self.n_rows)
+        return start, stop
+
+    def mask(self, selections, window=None):
+        """Row bitmap of the rows matching every non-empty ``{column: values}`` selection.
+
+        ``window`` is an optional row slice (e.g. the date window from
+        ``DateIndex.window``); the bitmap then covers only those rows.
+        """
+        lo, hi = self._window(window)
+        mask = np.ones(hi - lo, dtype=bool)
+        for column, values in selections.items():
+            if not values:
+                continue
+            rows = self.rows(column, values)
+            rows = rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+            column_mask = np.zeros(hi - lo, dtype=bool)
+            column_mask[rows - lo] = True
+            mask &= column_mask
+        return mask
+
+    def options(self, column, selections=None, window=None):
+        """Values of ``column`` occurring in the rows matched by ``selections`` within ``window``.
+
+        Used for the dependent State and City multiselects.
+        """
+        lo, hi = self._window(window)
+        codes = self._codes[column][lo:hi]
+        if selections and any(selections.values()):
+            codes = codes[self.mask(selections, window)]
+        present = np.bincount(codes[codes >= 0], minlength=len(self._values[column])) > 0
+        return self._values[column][present].tolist()
+
+
+def take(df, mask):
+    """Rows of ``df`` selected by a row bitmap, without copying when every row is selected."""
+    if mask.all():
+        return df
+    return df[mask]
+
@@ -0,0 +1,142 @@
+"""Chunked streaming ingest of large CSV files.
+
+``stream_csv`` reads a CSV in fixed-size row chunks, cleans the dates of
+each chunk, appends it to the columnar cache file and folds it into running
+KPI totals and cube cells. Only one chunk of parsed text is held at a time,
+so peak memory during ingest is set by the chunk size rather than the file
+size. The dashboard streams large CSV files into a DuckDB file instead
+(``sql.stream_path``) and queries it in place, so memory stays bounded after
+ingest too. Without duckdb it falls back to this Arrow file, which the
+loader memory-maps and reads back as a frame of the columns the panels
+need: that frame, not the chunk size, then bounds memory.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from superstore import storage
+from superstore.cube import DIMENSIONS, LINES, MEASURES, MONTH, aggregate_cells
+from superstore.schema import CATEGORICAL_COLUMNS, CSV_ENCODING, csv_dtypes, parse_dates
+
+DEFAULT_CHUNK_ROWS = int(os.environ.get("SUPERSTORE_CHUNK_ROWS", "100000"))
+# uploads larger than this are streamed instead of parsed in one piece
+STREAM_THRESHOLD_BYTES = int(os.environ.get("SUPERSTORE_STREAM_THRESHOLD_BYTES", str(100 * 1024 * 1024)))
+# merge the partial cube cells and order ids after this many chunks
+COMPACT_EVERY = 16
+
+
+class IngestSummary:
+    """KPI totals and cube cells accumulated chunk by chunk.
+
+    With ``cells=False`` only the totals are kept, for callers that query
+    the ingested rows in place and never build a cube from them.
+    """
+
+    def __init__(self, cells=True):
+        self.with_cells = cells
+        self.rows = 0
+        self.sales = 0.0
+        self.profit = 0.0
+        self._order_ids = []
+        self._cells = []
+
+    @property
+    def orders(self):
+        """Number of distinct Order IDs (64-bit hashes, so collisions are negligible)."""
+        self._compact()
+        return len(self._order_ids[0]) if self._order_ids else 0
+
+    @property
+    def cells(self):
+        if not self.with_cells:
+            raise ValueError("this summary was built without cube cells")
+        self._compact()
+        if not self._cells:
+            return pd.DataFrame(columns=DIMENSIONS + [MONTH] + MEASURES + [LINES])
+        cells = self._cells[0].copy()
+        for column in CATEGORICAL_COLUMNS:
+            if column in cells.columns:
+                cells[column] = cells[column].astype("category")
+        # sums of the nullable integer read dtypes are never missing
+        for column in MEASURES:
+            if column in cells.columns and isinstance(cells[column].dtype, pd.api.extensions.ExtensionDtype):
+                cells[column] = cells[column].to_numpy(dtype="float64")
+        return cells
+
+    def add(self, chunk):
+        self.rows += len(chunk)
+        if "Sales" in chunk.columns:
+            self.sales += float(chunk["Sales"].sum())
+        if "Profit" in chunk.columns:
+            self.profit += float(chunk["Profit"].sum())
+        if "Order ID" in chunk.columns:
+            hashes = pd.util.hash_pandas_object(chunk["Order ID"], index=False).to_numpy()
+            self._order_ids.append(np.unique(hashes))
+        if self.with_cells and "Order Date" in chunk.columns:
+            self._cells.append(aggregate_cells(chunk))
+        if len(self._cells) >= COMPACT_EVERY or len(self._order_ids) >= COMPACT_EVERY:
+            self._compact()
+
+    def _compact(self):
+        if len(self._order_ids) > 1:
+            self._order_ids = [np.unique(np.concatenate(self._order_ids))]
+        if len(self._cells) > 1:
+            # chunks have different categories, so concat falls back to plain values
+            cells = pd.concat(self._cells, ignore_index=True)
+            keys = [c for c in DIMENSIONS + [MONTH] if c in cells.columns]
+            values = [c for c in MEASURES + [LINES] if c in cells.columns]
+            self._cells = [cells.groupby(keys, observed=True, sort=False, dropna=False)[values].sum().reset_index()]
+
+
+def read_chunks(handle, summary, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None):
+    """Yield the CSV in ``handle`` as date-parsed chunks of ``chunk_rows`` rows, folding each into ``summary``.
+
+    ``progress`` is called as ``progress(fraction, text)`` after every chunk.
+    """
+    handle.seek(0, os.SEEK_END)
+    total_bytes = handle.tell() or 1
+    handle.seek(0)
+    columns = pd.read_csv(handle, encoding=CSV_ENCODING, nrows=0).columns
+    handle.seek(0)
+    reader = pd.read_csv(handle, encoding=CSV_ENCODING, dtype=csv_dtypes(columns), chunksize=chunk_rows)
+    for chunk in reader:
+        chunk = parse_dates(chunk)
+        summary.add(chunk)
+        yield chunk
+        if progress is not None:
+            fraction = min(handle.tell() / total_bytes, 1.0)
+            progress(fraction, f"Ingested {summary.rows:,} rows")
+    if not summary.rows:
+        raise ValueError("The uploaded CSV file has no rows.")
+    if progress is not None:
+        progress(1.0, f"Ingested {summary.rows:,} rows")
+
+
+def stream(source, write, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, cells=True):
+    """Pass the chunks of the CSV ``source`` (a path or binary file object) to ``write(chunks)``.
+
+    Returns the ``IngestSummary`` of the whole file, with cube cells unless
+    ``cells`` is false.
+    """
+    handle = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        summary = IngestSummary(cells)
+        write(read_chunks(handle, summary, chunk_rows, progress))
+    finally:
+        if handle is not source:
+            handle.close()
+    return summary
+
+
+def stream_csv(source, path, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None):
+    """Stream the CSV ``source`` (a path or binary file object) into the Arrow file ``path``.
+
+    ``progress`` is called as ``progress(fraction, text)`` after every chunk.
+    Returns the ``IngestSummary`` of the whole file.
+    """
+    def write(chunks):
+        storage.write_chunks(chunks, path)
+        storage.prune()
+
+    return stream(source, write, chunk_rows, progress)
@@ -0,0 +1,225 @@
+"""Cached, typed loading of the Superstore dataset.
+
+Every widget interaction reruns the dashboard script, so the raw file must
+not be parsed again on each rerun. Datasets are kept in one cache per
+server process, keyed on the uploaded file's content hash, or on the
+default file's path, size and modification time, and are returned with
+dates already parsed, low-cardinality text columns stored as categoricals
+and numerics downcast. Rows are sorted by Order Date so date windows are
+contiguous slices (see ``superstore.dates``).
+
+A dataset is loaded once however many sessions show it. Each load returns
+a shallow copy of the shared frame: no data is copied, and with pandas'
+copy-on-write (always on since pandas 3, which requirements.txt asks for)
+a write to the copy never reaches the shared frame or other sessions.
+Loads made for a session hold the dataset in the cache until that
+session loads another one or ends (see ``release_inactive``); a
+dataset no session holds is dropped once more than ``MAX_IDLE_DATASETS``
+are idle.
+
+Parsed sources are also written to the columnar cache in ``storage``, so a
+source is only parsed once; later loads memory-map the cached file and read
+back just the requested columns.
+"""
+import hashlib
+import os
+import weakref
+from threading import RLock
+
+import pandas as pd
+
+from superstore import ingest, profiling, storage
+from superstore.cache import KeyLocks, SessionCache
+from superstore.cube import SalesCube
+from superstore.schema import CSV_ENCODING, compact, parse_dates, sort_by_order_date
+
+DEFAULT_DATASET = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cleaned_superstore.csv"
+)
+# datasets kept after the last session using them has moved on or ended
+MAX_IDLE_DATASETS = 2
+# the only directory whose files the dashboard opens by path; unset, no paths are accepted
+DATA_DIR = os.environ.get("SUPERSTORE_DATA_DIR")
+
+# columns of the row-level tables the dashboard panels show; batch reports load only these
+DASHBOARD_COLUMNS = [
+    "Order ID", "Order Date", "Ship Mode", "Segment", "City", "State", "Region",
+    "Category", "Sub-Category", "Product Name", "Sales", "Quantity", "Discount", "Profit",
+]
+
+_datasets = SessionCache(MAX_IDLE_DATASETS)
+# structures derived from a loaded frame (cube, indexes), keyed by id() of the frame
+_derived = {}
+# id() of each copy handed out -> the shared frame it was made from
+_shared = {}
+_derived_lock = RLock()
+_derived_builds = KeyLocks()
+
+
+def upload_key(name, data):
+    """Cache key for an uploaded file: its extension plus a hash of its bytes."""
+    return "upload:" + os.path.splitext(name)[1].lower() + ":" + hashlib.sha256(data).hexdigest()
+
+
+def path_key(path):
+    """Cache key for a file on disk: its absolute path, size and mtime."""
+    stat = os.stat(path)
+    return f"path:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def data_file(path):
+    """The real path of ``path`` inside ``DATA_DIR``; anything outside it is refused.
+
+    Paths typed into the dashboard come from the browser, so they are
+    resolved relative to ``DATA_DIR`` with symlinks followed before the check.
+    """
+    if not DATA_DIR:
+        raise ValueError("Opening files by path is disabled; set SUPERSTORE_DATA_DIR on the server to allow it.")
+    root = os.path.realpath(DATA_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"{path} is outside the data directory.")
+    return resolved
+
+
+def read_raw(name, buffer):
+    """Parse a CSV or Excel file into an untyped DataFrame."""
+    lower = name.lower()
+    if lower.endswith(".csv"):
+        return pd.read_csv(buffer, encoding=CSV_ENCODING)
+    if lower.endswith(".xlsx"):
+        return pd.read_excel(buffer)
+    raise ValueError("Unsupported file format. Please upload a CSV or Excel file.")
+
+
+def prepare_frame(df):
+    """Parse dates, sort by Order Date, convert low-cardinality columns to categoricals and downcast numerics."""
+    with profiling.stage("parse dates", len(df)):
+        df = parse_dates(df)
+    with profiling.stage("sort by order date", len(df)):
+        df = sort_by_order_date(df)
+    with profiling.stage("compact dtypes", len(df)):
+        return compact(df)
+
+
+def _read_cached(path, columns):
+    with profiling.stage("read columnar cache") as record:
+        # streamed files are stored unsorted and untyped; this is a no-op otherwise
+        df = compact(sort_by_order_date(storage.read_arrow(path, columns)))
+        record.rows_out = len(df)
+    return df
+
+
+def _load(key, name, open_source, columns, chunk_rows=None, progress=None, session=None):
+    """Return the typed frame for ``key``, parsing the source only if no columnar copy exists.
+
+    With ``chunk_rows`` a CSV source is streamed into the columnar cache in
+    chunks of that many rows instead of being parsed in one piece.
+    """
+    if columns is not None:
+        columns = tuple(columns)
+
+    def build():
+        if storage.available():
+            path = storage.cache_path(key)
+            if not os.path.exists(path) and chunk_rows and name.lower().endswith(".csv"):
+                with profiling.stage("stream csv") as record:
+                    summary = ingest.stream_csv(open_source(), path, chunk_rows, progress)
+                    record.rows_out = summary.rows
+                df = _read_cached(path, columns)
+                # the cube was built while streaming, so don't regroup the rows for it
+                derived(df, "cube", lambda: SalesCube(summary.cells))
+                derived(df, "ingest_summary", lambda: summary)
+                return df
+            if os.path.exists(path):
+                return _read_cached(path, columns)
+        with profiling.stage("read source") as record:
+            df = read_raw(name, open_source())
+            record.rows_out = len(df)
+        df = prepare_frame(df)
+        if storage.available():
+            with profiling.stage("write columnar cache", len(df)):
+                storage.write_arrow(df, storage.cache_path(key))
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+    return cached_frame(key, columns, build, session)
+
+
+def cached_frame(key, columns, build, session=None):
+    """A copy of the shared frame for ``key`` and ``columns``, built by ``build()`` on a miss.
+
+    With ``session`` the dataset is held for that session (see ``SessionCache``).
+    """
+    df = _datasets.get_or_create((key, columns), build, session)
+    derived(df, "source_key", lambda: (key, columns))
+    return _copy(df)
+
+
+def _copy(df):
+    copy = df.copy(deep=False)
+    with _derived_lock:
+        _shared[id(copy)] = df
+        weakref.finalize(copy, _shared.pop, id(copy), None)
+    return copy
+
+
+def release_session(session):
+    """Stop holding the dataset ``session`` loaded last, e.g. when it switched to a database."""
+    _datasets.release(session)
+
+
+def release_inactive(is_active):
+    """Release the datasets of every session for which ``is_active(session)`` is false."""
+    _datasets.release_inactive(is_active)
+
+
+def load_upload(uploaded_file, columns=None, chunk_rows=None, progress=None, session=None):
+    """Load a Streamlit ``UploadedFile``, reusing the cached frame when the bytes are unchanged."""
+    with uploaded_file.getbuffer() as data:
+        key = upload_key(uploaded_file.name, data)
+
+    def open_source():
+        uploaded_file.seek(0)
+        return uploaded_file
+
+    return _load(key, uploaded_file.name, open_source, columns, chunk_rows, progress, session)
+
+
+def load_path(path=DEFAULT_DATASET, columns=None, chunk_rows=None, progress=None, session=None):
+    """Load a dataset from disk, reusing the cached frame until the file changes."""
+    return _load(path_key(path), path, lambda: path, columns, chunk_rows, progress, session)
+
+
+def derived(df, name, factory):
+    """Return the structure ``name`` built from ``df``, calling ``factory()`` only once per frame.
+
+    Entries are dropped when the frame is garbage collected, so ``factory``
+    results must not keep a reference to ``df`` itself. Copies returned by
+    the loader share the entries of the frame they were made from.
+    """
+    with _derived_lock:
+        df = _shared.get(id(df), df)
+        entry = _derived.get(id(df))
+        if entry is None:
+            entry = _derived[id(df)] = {}
+            weakref.finalize(df, _derived.pop, id(df), None)
+        if name in entry:
+            return entry[name]
+    # build outside the lock, so one session's index build does not stall the others
+    with _derived_builds.lock((id(df), name)):
+        if name not in entry:
+            value = factory()
+            with _derived_lock:
+                entry.setdefault(name, value)
+        return entry[name]
+
+
+def source_key(df):
+    """The cache key a frame returned by ``load_upload``/``load_path`` was loaded under."""
+    return derived(df, "source_key", lambda: None)
+
+
+def clear_cache():
+    _datasets.clear()
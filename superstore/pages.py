@@ -0,0 +1,100 @@
+"""Server-side pagination for the dataset viewer.
+
+A pager answers "how many rows match this search" and "give me page N of
+these columns, sorted by this column" without sending anything but the
+visible page to the browser. ``FramePager`` works over an in-memory frame:
+the sort order of a column is computed once (a permutation of row
+positions) and the rows matching a search once (a bitmap), both cached, so
+any page is then a slice of the permutation and a ``take`` of ``size``
+rows, whatever the page number. ``superstore.sql.SqlPager`` offers the
+same methods over a database table.
+
+Search is a case-insensitive substring match over the shown text columns;
+categorical columns are matched on their categories, so searching them
+costs one pass over the integer codes.
+"""
+import numpy as np
+import pandas as pd
+
+from superstore.cache import LRUCache
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+DEFAULT_PAGE_SIZE = 50
+# sort permutations and search bitmaps are one entry per row, so keep few
+MAX_CACHED_VIEWS = 16
+
+_views = LRUCache(MAX_CACHED_VIEWS)
+
+
+def page_count(total, size):
+    return max(1, -(-total // size))
+
+
+def text_columns(frame, columns):
+    return [
+        c for c in columns
+        if isinstance(frame[c].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(frame[c].dtype)
+    ]
+
+
+def search_mask(frame, text, columns):
+    """Rows where any of the text ``columns`` contains ``text``, ignoring case."""
+    needle = text.lower()
+    mask = np.zeros(len(frame), dtype=bool)
+    for column in text_columns(frame, columns):
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            hits = values.cat.categories.astype(str).str.lower().str.contains(needle, regex=False)
+            mask |= np.isin(values.cat.codes.to_numpy(), np.flatnonzero(hits))
+        else:
+            mask |= values.str.contains(needle, case=False, regex=False, na=False).to_numpy(dtype=bool)
+    return mask
+
+
+class FramePager:
+    """Pages of an in-memory frame; ``key`` identifies the frame's contents in the view cache."""
+
+    def __init__(self, frame, key):
+        self.frame = frame
+        self.key = key
+        self.columns = frame.columns.tolist()
+
+    def _order(self, sort_by, ascending):
+        def build():
+            values = self.frame[sort_by].reset_index(drop=True)
+            return values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+
+        return _views.get_or_create((self.key, "order", sort_by, ascending), build)
+
+    def _mask(self, search, columns):
+        return _views.get_or_create((self.key, "search", search, tuple(columns)),
+                                    lambda: search_mask(self.frame, search, columns))
+
+    def _positions(self, sort_by, ascending, search, columns):
+        """Row positions of the view in display order, or None for the frame as it is."""
+        if sort_by is None and not search:
+            return None
+
+        def build():
+            positions = self._order(sort_by, ascending) if sort_by is not None else np.arange(len(self.frame))
+            if search:
+                positions = positions[self._mask(search, columns)[positions]]
+            return positions
+
+        return _views.get_or_create((self.key, "view", sort_by, ascending, search, tuple(columns)), build)
+
+    def count(self, search="", columns=None):
+        if not search:
+            return len(self.frame)
+        return int(self._mask(search, columns or self.columns).sum())
+
+    def page(self, number, size, columns=None, sort_by=None, ascending=True, search=""):
+        """Rows ``number * size`` up to ``(number + 1) * size`` of the view."""
+        columns = columns or self.columns
+        positions = self._positions(sort_by, ascending, search, columns)
+        start = number * size
+        if positions is None:
+            rows = self.frame.iloc[start:start + size]
+        else:
+            rows = self.frame.iloc[positions[start:start + size]]
+        return rows[columns]
@@ -0,0 +1,210 @@
+"""Per-stage timing and memory instrumentation of a dashboard rerun.
+
+The script creates a ``Profiler`` per rerun and activates it; any code,
+including the loader and the backends, then wraps its stages in
+``profiling.stage(name)``. Each stage records its wall time, rows in and
+out, and the change in the process's resident memory. Stages can nest;
+a record keeps its depth so the debug panel can indent it.
+
+When the profiler is off (the default), ``stage`` returns a shared no-op
+context manager, so instrumented code pays for one context variable
+lookup per stage and nothing else.
+
+Records can be exported for offline analysis: ``SUPERSTORE_METRICS_JSONL``
+names a file that gets one JSON line per stage, and
+``SUPERSTORE_METRICS_PROM`` a Prometheus textfile (for node_exporter's
+textfile collector) holding the latest value of every stage plus
+process-wide totals. Setting either turns profiling on.
+"""
+import contextvars
+import itertools
+import json
+import os
+import time
+import uuid
+from threading import Lock
+
+METRICS_JSONL = os.environ.get("SUPERSTORE_METRICS_JSONL")
+METRICS_PROM = os.environ.get("SUPERSTORE_METRICS_PROM")
+ENABLED_BY_DEFAULT = os.environ.get("SUPERSTORE_PROFILE", "") not in ("", "0")
+
+_current = contextvars.ContextVar("superstore_profiler", default=None)
+# process-wide latest record and totals per stage, for the Prometheus textfile
+_latest = {}
+_totals = {}
+_export_lock = Lock()
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # pragma: no cover - not on Linux
+    _PAGE_SIZE = None
+
+
+def exporting():
+    return bool(METRICS_JSONL or METRICS_PROM)
+
+
+def rss_bytes():
+    """Resident memory of this process, or None where it cannot be read cheaply."""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+class Record:
+    """Measurements of one stage."""
+
+    __slots__ = ("name", "depth", "seconds", "rows_in", "rows_out", "memory_delta")
+
+    def __init__(self, name, depth, rows_in=None):
+        self.name = name
+        self.depth = depth
+        self.seconds = None
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.memory_delta = None
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class _Stage:
+    def __init__(self, profiler, name, rows_in):
+        self.profiler = profiler
+        self.record = Record(name, profiler._depth, rows_in)
+
+    def __enter__(self):
+        self.profiler._depth += 1
+        self.profiler.records.append(self.record)
+        self._rss = rss_bytes()
+        self._started = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc):
+        self.record.seconds = time.perf_counter() - self._started
+        rss = rss_bytes()
+        if rss is not None and self._rss is not None:
+            self.record.memory_delta = rss - self._rss
+        self.profiler._depth -= 1
+        return False
+
+
+class _NullStage:
+    """What ``stage`` returns while profiling is off; its record is never read."""
+
+    def __enter__(self):
+        return _NULL_RECORD
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+_NULL_RECORD = Record(None, 0)
+
+
+class Profiler:
+    """Stage records of one rerun."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.run_id = uuid.uuid4().hex
+        self.records = []
+        self._depth = 0
+        self._flushed = 0
+
+    def table(self):
+        """The records as rows for the debug panel, nested stages indented."""
+        return [
+            {
+                "stage": "\u2003" * r.depth + r.name,
+                "ms": None if r.seconds is None else round(r.seconds * 1000, 2),
+                "rows in": r.rows_in,
+                "rows out": r.rows_out,
+                "memory Δ MiB": None if r.memory_delta is None else round(r.memory_delta / 2**20, 2),
+            }
+            for r in self.records
+        ]
+
+    def total_seconds(self):
+        return sum(r.seconds or 0.0 for r in self.records if r.depth == 0)
+
+    def flush(self):
+        """Export the records finished since the last flush to the configured metrics files."""
+        if not self.enabled or not exporting():
+            return
+        # records are in start order, so stop at the first stage still running
+        finished = list(itertools.takewhile(lambda r: r.seconds is not None, self.records[self._flushed:]))
+        self._flushed += len(finished)
+        if not finished:
+            return
+        with _export_lock:
+            if METRICS_JSONL:
+                write_jsonl(METRICS_JSONL, self.run_id, finished)
+            if METRICS_PROM:
+                for record in finished:
+                    _latest[record.name] = record
+                    seconds, runs = _totals.get(record.name, (0.0, 0))
+                    _totals[record.name] = (seconds + record.seconds, runs + 1)
+                write_prometheus(METRICS_PROM, _latest, _totals)
+
+
+def write_jsonl(path, run_id, records):
+    timestamp = time.time()
+    with open(path, "a", encoding="utf-8") as sink:
+        for record in records:
+            sink.write(json.dumps({"time": timestamp, "run": run_id, **record.as_dict()}) + "\n")
+
+
+def _label(name):
+    return name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus(path, latest, totals):
+    """Rewrite the textfile atomically, so the collector never reads half a file."""
+    metrics = [
+        ("superstore_stage_seconds", "gauge", "Wall time of the latest run of a dashboard stage.",
+         {name: r.seconds for name, r in latest.items()}),
+        ("superstore_stage_rows_in", "gauge", "Rows going into the latest run of a dashboard stage.",
+         {name: r.rows_in for name, r in latest.items()}),
+        ("superstore_stage_rows_out", "gauge", "Rows coming out of the latest run of a dashboard stage.",
+         {name: r.rows_out for name, r in latest.items()}),
+        ("superstore_stage_memory_delta_bytes", "gauge", "Resident memory change over the latest run of a stage.",
+         {name: r.memory_delta for name, r in latest.items()}),
+        ("superstore_stage_seconds_total", "counter", "Wall time of all runs of a dashboard stage.",
+         {name: seconds for name, (seconds, _) in totals.items()}),
+        ("superstore_stage_runs_total", "counter", "Number of runs of a dashboard stage.",
+         {name: runs for name, (_, runs) in totals.items()}),
+    ]
+    lines = []
+    for metric, kind, help_text, values in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f'{metric}{{stage="{_label(name)}"}} {value}')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as sink:
+        sink.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def activate(profiler):
+    """Make ``profiler`` the one ``stage`` records into, for the current thread (script run)."""
+    _current.set(profiler)
+    return profiler
+
+
+def stage(name, rows_in=None):
+    """``with stage(name) as record:`` times the block in the active profiler, if any.
+
+    Set ``record.rows_out`` (and ``record.rows_in``) inside the block.
+    """
+    profiler = _current.get()
+    if profiler is None or not profiler.enabled:
+        return _NULL_STAGE
+    return _Stage(profiler, name, rows_in)
@@ -0,0 +1,64 @@
+"""Column roles of the Superstore dataset and the typing applied on load."""
+import numpy as np
+import pandas as pd
+
+CSV_ENCODING = "ISO-8859-1"
+
+DATE_COLUMNS = ["Order Date", "Ship Date"]
+CATEGORICAL_COLUMNS = ["Region", "State", "City", "Category", "Sub-Category", "Ship Mode", "Segment", "Discount Range"]
+INTEGER_COLUMNS = ["Row ID", "Postal Code", "Quantity", "Order Month", "Order Year", "Delivery Time"]
+FLOAT_COLUMNS = ["Sales", "Discount", "Profit", "Profit per Unit"]
+# the measures are summed into KPIs and written to databases, where float32
+# rounding would show up as drift, and Discount is compared against
+# thresholds such as 0.3 that float32 cannot represent; all stay float64.
+FULL_PRECISION_COLUMNS = ["Sales", "Discount", "Profit", "Profit per Unit"]
+
+
+def csv_dtypes(columns):
+    """Explicit ``read_csv`` dtypes, so every chunk of a streamed file gets the same schema."""
+    dtypes = {}
+    for column in columns:
+        if column in INTEGER_COLUMNS:
+            dtypes[column] = "Int64"
+        elif column in FLOAT_COLUMNS:
+            dtypes[column] = "float64"
+        else:
+            dtypes[column] = "str"
+    return dtypes
+
+
+def parse_dates(df):
+    """Clean any extra whitespace, then parse US-style (MM/DD/YYYY) or ISO dates."""
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            values = df[column].astype(str).str.strip()
+            df[column] = pd.to_datetime(values, errors="coerce", dayfirst=False)
+    return df
+
+
+def sort_by_order_date(df):
+    if "Order Date" in df.columns and not df["Order Date"].is_monotonic_increasing:
+        df = df.sort_values("Order Date", kind="stable", na_position="last", ignore_index=True)
+    return df
+
+
+def compact(df):
+    """Store low-cardinality columns as categoricals and downcast numerics, skipping columns already done.
+
+    Integers are downcast to the smallest type holding their range; other
+    floats only when every value survives the round trip through float32.
+    """
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+
+    for column in df.select_dtypes(include="integer").columns:
+        if df[column].dtype.itemsize > 1:
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+    for column in df.select_dtypes(include="float").columns:
+        if column not in FULL_PRECISION_COLUMNS and df[column].dtype.itemsize > 4:
+            values = df[column].to_numpy()
+            downcast = values.astype("float32")
+            if np.array_equal(downcast, values, equal_nan=True):
+                df[column] = downcast
+    return df
@@ -0,0 +1,494 @@
+"""Embedded SQL backend: query a DuckDB or SQLite database in place.
+
+``SqlBackend`` answers the same questions as ``backend.FrameBackend``, but
+compiles the date window, the Region/State/City selections, the row-level
+conditions and every panel's groupby to SQL and runs them inside the
+database. Only result sets (panel tables, filter options, a few rows) come
+back into Python, so neither the load time nor the memory use of the
+dashboard grows with the size of the table.
+
+DuckDB computes all panels of one call in a single scan with GROUPING
+SETS; SQLite, which lacks them, runs one GROUP BY per independent key set
+(see ``aggregate.plan``). The database is opened read-only and query
+results are cached per backend, so reruns with unchanged filters do not
+touch the database. Convert a CSV or Excel export with::
+
+    python -m superstore.sql cleaned_superstore.csv superstore.duckdb
+
+Large CSV files are streamed into a DuckDB file in the cache directory
+chunk by chunk (``stream_path``/``stream_upload``) and queried there, so a
+file larger than RAM never has to fit in memory. Memory is then bounded by
+one parsed chunk, ``DUCKDB_MEMORY_LIMIT`` and the running KPI summary (a
+hash per distinct Order ID and the cube cells), not by the number of rows.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sqlite3
+from threading import RLock
+
+import pandas as pd
+
+from superstore import ingest, profiling, storage
+from superstore.aggregate import FILTERED_PANELS, PanelAggregates, aggregate, panel_table, plan
+from superstore.backend import OPERATORS
+from superstore.cache import KeyLocks, LRUCache
+from superstore.cube import LINES
+from superstore.loader import DASHBOARD_COLUMNS, load_path, path_key, upload_key
+from superstore.pages import text_columns
+from superstore.schema import CATEGORICAL_COLUMNS, parse_dates
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - depends on the environment
+    duckdb = None
+
+DEFAULT_TABLE = "superstore"
+DATABASE_EXTENSIONS = (".duckdb", ".ddb", ".db", ".sqlite", ".sqlite3")
+SCRIPT_EXTENSIONS = (".sql",)
+SQLITE_HEADER = b"SQLite format 3\x00"
+# rows shown by the data overview options, which cannot page through the whole table
+PREVIEW_ROWS = 1000
+MAX_OPEN_DATABASES = 4
+# buffer memory of each DuckDB connection; DuckDB spills to disk beyond it instead
+# of keeping up to 80% of RAM, which is what bounds memory on streamed files
+DUCKDB_MEMORY_LIMIT = os.environ.get("SUPERSTORE_DUCKDB_MEMORY_LIMIT", "256MB")
+MAX_CACHED_QUERIES = 256
+# what an uploaded SQL script may do: create and fill tables of the new database
+SCRIPT_ACTIONS = {
+    sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_CREATE_INDEX, sqlite3.SQLITE_INSERT,
+    sqlite3.SQLITE_READ, sqlite3.SQLITE_SELECT, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_TRANSACTION,
+    sqlite3.SQLITE_REINDEX,
+}
+SCHEMA_TABLES = ("sqlite_master", "sqlite_schema")
+# the sqlite3 shell's .dump output starts with PRAGMA foreign_keys=OFF
+SCRIPT_PRAGMAS = ("foreign_keys",)
+
+_backends = LRUCache(MAX_OPEN_DATABASES)
+# streamed database path -> IngestSummary of the run that wrote it
+_summaries = LRUCache(MAX_OPEN_DATABASES)
+_streams = KeyLocks()
+
+
+def quote(name):
+    """Quote an identifier; the Superstore columns contain spaces and hyphens."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def is_database(name):
+    return name.lower().endswith(DATABASE_EXTENSIONS + SCRIPT_EXTENSIONS)
+
+
+def dialect(path):
+    """``"sqlite"`` or ``"duckdb"``, from the file header rather than the extension."""
+    with open(path, "rb") as handle:
+        header = handle.read(len(SQLITE_HEADER))
+    if header == SQLITE_HEADER or path.lower().endswith(".sqlite") or path.lower().endswith(".sqlite3"):
+        return "sqlite"
+    if duckdb is None:
+        raise ValueError("DuckDB databases need the duckdb package; install it or use a SQLite database.")
+    return "duckdb"
+
+
+def _authorize_script(action, arg1, arg2, database, trigger):
+    """SQLite authorizer for uploaded scripts: only CREATE TABLE/INDEX and INSERT on ``main``.
+
+    Everything else, ATTACH and ``VACUUM INTO`` (which write other files),
+    PRAGMA other than the ``foreign_keys`` one of ``.dump`` output, triggers,
+    views, temporary tables, UPDATE and DELETE, is denied.
+    """
+    if action == sqlite3.SQLITE_PRAGMA:
+        return sqlite3.SQLITE_OK if arg1.lower() in SCRIPT_PRAGMAS and database is None else sqlite3.SQLITE_DENY
+    if action not in SCRIPT_ACTIONS or database not in (None, "main") or trigger is not None:
+        # CREATE TABLE/INDEX rewrite the schema table; a script cannot otherwise update it
+        if not (action == sqlite3.SQLITE_UPDATE and database == "main" and arg1 in SCHEMA_TABLES):
+            return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_FUNCTION and arg2.lower() == "load_extension":
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def run_script(script, path):
+    """Run an uploaded SQL script into a new SQLite database at ``path``."""
+    connection = sqlite3.connect(path)
+    try:
+        connection.set_authorizer(_authorize_script)
+        with connection:
+            connection.executescript(script)
+    except sqlite3.DatabaseError as exc:
+        raise ValueError(f"The uploaded SQL script can only create and fill tables: {exc}") from exc
+    finally:
+        connection.close()
+
+
+def save_upload(uploaded_file):
+    """Store an uploaded database file (or SQL script) in the cache directory and return its path.
+
+    A ``.sql`` script is run into a new SQLite database; it may only create
+    tables and indexes and insert rows (see ``run_script``). Files are named by
+    the hash of their bytes, so uploading the same file again reuses them.
+    """
+    with uploaded_file.getbuffer() as data:
+        key = upload_key(uploaded_file.name, data)
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(storage.CACHE_DIR, key.split(":")[-1] + (".sqlite" if extension == ".sql" else extension))
+    if os.path.exists(path):
+        return path
+    os.makedirs(storage.CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    uploaded_file.seek(0)
+    try:
+        if extension in SCRIPT_EXTENSIONS:
+            run_script(uploaded_file.read().decode("utf-8"), tmp_path)
+        else:
+            with open(tmp_path, "wb") as sink:
+                shutil.copyfileobj(uploaded_file, sink)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class SqlBackend:
+    """Backend over one table of a DuckDB or SQLite database file."""
+
+    def __init__(self, path, table=DEFAULT_TABLE):
+        self.path = path
+        self.table = table
+        self.dialect = dialect(path)
+        self.key = (path_key(path), table)
+        self._lock = RLock()
+        self._results = LRUCache(MAX_CACHED_QUERIES)
+        self._text_columns = None
+        try:
+            if self.dialect == "duckdb":
+                self._connection = duckdb.connect(path, read_only=True, config={"memory_limit": DUCKDB_MEMORY_LIMIT})
+            else:
+                self._connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            self.columns = [d[0] for d in self._cursor().execute(f"SELECT * FROM {quote(table)} LIMIT 0").description]
+        except Exception as exc:
+            raise ValueError(f"Cannot read table {table!r} from {path}: {exc}") from exc
+        if "Order Date" not in self.columns:
+            raise ValueError(f"Table {table!r} has no 'Order Date' column.")
+        # row-level queries only fetch the columns the panels show
+        self.row_columns = [c for c in DASHBOARD_COLUMNS if c in self.columns]
+
+    def clear_cache(self):
+        """Forget the cached query results, e.g. to time the queries themselves."""
+        self._results.clear()
+
+    def _cursor(self):
+        # DuckDB connections must not be shared between threads, their cursors may be
+        return self._connection.cursor() if self.dialect == "duckdb" else self._connection
+
+    def query(self, sql, params=()):
+        """Run ``sql`` and return the result as a DataFrame, cached by (sql, params)."""
+        def run():
+            with profiling.stage("sql query") as record:
+                if self.dialect == "duckdb":
+                    result = self._cursor().execute(sql, list(params)).df()
+                else:
+                    with self._lock:
+                        cursor = self._connection.execute(sql, list(params))
+                        result = pd.DataFrame.from_records(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+                record.rows_out = len(result)
+            return result
+
+        return self._results.get_or_create((sql, tuple(params)), run)
+
+    def _date(self, value):
+        value = pd.Timestamp(value).date()
+        # SQLite stores dates as text; day-precision strings compare correctly
+        # with both "YYYY-MM-DD" and "YYYY-MM-DD HH:MM:SS" values
+        return value.isoformat() if self.dialect == "sqlite" else value
+
+    def _where(self, start=None, end=None, selections=None, where=()):
+        """WHERE clause and parameters for a date window, selections and conditions."""
+        clauses, params = [], []
+        if start is not None:
+            # the window covers whole days: start <= date < the day after end
+            clauses.append(f"{quote('Order Date')} >= ? AND {quote('Order Date')} < ?")
+            params += [self._date(start), self._date(pd.Timestamp(end) + datetime.timedelta(days=1))]
+        for column, values in (selections or {}).items():
+            if values:
+                clauses.append(f"{quote(column)} IN ({', '.join('?' * len(values))})")
+                params += list(values)
+        for column, op, value in where:
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported operator: {op}")
+            clauses.append(f"{quote(column)} {op} ?")
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    @property
+    def frame(self):
+        """The first ``PREVIEW_ROWS`` rows, for the data overview options."""
+        return parse_dates(self.query(f"SELECT * FROM {quote(self.table)} LIMIT {PREVIEW_ROWS}").copy())
+
+    @property
+    def text_columns(self):
+        """Columns holding text, which the viewer's search looks at."""
+        if self._text_columns is None:
+            preview = self.frame
+            self._text_columns = text_columns(preview, preview.columns)
+        return self._text_columns
+
+    @property
+    def first(self):
+        return self._date_bounds()[0]
+
+    @property
+    def last(self):
+        return self._date_bounds()[1]
+
+    def _date_bounds(self):
+        date = quote("Order Date")
+        bounds = self.query(f"SELECT MIN({date}) AS first, MAX({date}) AS last FROM {quote(self.table)}")
+        return pd.to_datetime(bounds.iloc[0, 0]), pd.to_datetime(bounds.iloc[0, 1])
+
+    def totals(self, start, end, selections=None):
+        where, params = self._where(start, end, selections)
+        totals = self.query(
+            f"SELECT COALESCE(SUM({quote('Sales')}), 0) AS sales, COALESCE(SUM({quote('Profit')}), 0) AS profit,"
+            f" COUNT(DISTINCT {quote('Order ID')}) AS orders, COUNT(*) AS lines FROM {quote(self.table)}{where}",
+            params,
+        )
+        sales, profit, orders, lines = totals.iloc[0]
+        return {"Sales": float(sales), "Profit": float(profit), "Orders": int(orders), "Lines": int(lines)}
+
+    def options(self, column, start, end, selections=None):
+        where, params = self._where(start, end, selections)
+        where += (" AND " if where else " WHERE ") + f"{quote(column)} IS NOT NULL"
+        values = self.query(
+            f"SELECT DISTINCT {quote(column)} AS value FROM {quote(self.table)}{where} ORDER BY 1", params
+        )
+        return values["value"].tolist()
+
+    def _select(self, keys, measures):
+        """Select list of a groupby over ``keys`` summing ``measures``."""
+        items = [quote(k) for k in keys]
+        for measure in measures:
+            if measure == LINES:
+                items.append(f"COUNT(*) AS {quote(LINES)}")
+            else:
+                items.append(f"COALESCE(SUM({quote(measure)}), 0) AS {quote(measure)}")
+        return ", ".join(items)
+
+    def _scan_bases(self, bases, where, params):
+        """``{base: groupby(keys)[measures].sum()}`` for every base key set, pushed down to the database."""
+        table = quote(self.table)
+        if self.dialect == "sqlite" or len(bases) == 1:
+            return {
+                name: self.query(f"SELECT {self._select(keys, measures)} FROM {table}{where}"
+                                 f" GROUP BY {', '.join(quote(k) for k in keys)}", params)
+                for name, (keys, measures) in bases.items()
+            }
+        # one scan for every key set; GROUPING() tells the sets apart
+        columns = list(dict.fromkeys(k for keys, _ in bases.values() for k in keys))
+        measures = list(dict.fromkeys(m for _, ms in bases.values() for m in ms))
+        sets = ", ".join("(" + ", ".join(quote(k) for k in keys) + ")" for keys, _ in bases.values())
+        grouping = f"GROUPING({', '.join(quote(c) for c in columns)})"
+        result = self.query(
+            f"SELECT {self._select(columns, measures)}, {grouping} AS grouping_set FROM {table}{where}"
+            f" GROUP BY GROUPING SETS ({sets})",
+            params,
+        )
+        tables = {}
+        for name, (keys, base_measures) in bases.items():
+            # bit i (from the left) of GROUPING() is set when columns[i] is not grouped
+            mask = sum(1 << (len(columns) - 1 - i) for i, c in enumerate(columns) if c not in keys)
+            tables[name] = result.loc[result["grouping_set"] == mask, keys + base_measures]
+        return tables
+
+    def panels(self, start, end, selections=None, panels=FILTERED_PANELS):
+        """The same tables as ``aggregate``, with the base groupbys run in the database."""
+        bases, children = plan(panels)
+        where, params = self._where(start, end, selections)
+        tables = {}
+        for name, table in self._scan_bases(bases, where, params).items():
+            keys = bases[name][0]
+            # like the bincount engine, missing keys stay groups of their own until
+            # each panel drops those of its own keys
+            table = table.sort_values(keys, ignore_index=True)
+            # SQLite leaves the columns of an empty result untyped
+            table = table.astype({m: "int64" if m == LINES else "float64" for m in bases[name][1]})
+            for key in keys:
+                if key in CATEGORICAL_COLUMNS:
+                    table[key] = table[key].astype("category")
+            tables[name] = panel_table(table, panels[name])
+            if children[name]:
+                tables.update(aggregate(table, children[name]).tables)
+        return PanelAggregates({name: tables[name] for name in panels})
+
+    def rows(self, start, end, selections=None, where=(), order_by=None, ascending=False, limit=None):
+        """Order lines of the window matching ``selections`` and the ``where`` conditions."""
+        clause, params = self._where(start, end, selections, where)
+        sql = f"SELECT {', '.join(quote(c) for c in self.row_columns)} FROM {quote(self.table)}{clause}"
+        if order_by is not None:
+            sql += f" ORDER BY {quote(order_by)} {'ASC' if ascending else 'DESC'}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return parse_dates(self.query(sql, params).copy())
+
+    def pager(self, start=None, end=None, selections=None, where=()):
+        """A pager over the whole table, or over the ``rows`` of a window, selection and conditions."""
+        clause, params = self._where(start, end, selections, where)
+        return SqlPager(self, clause, params, self.columns if start is None else self.row_columns)
+
+
+def _like_pattern(text):
+    """A LIKE pattern matching ``text`` anywhere, with its wildcards escaped."""
+    escaped = text.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class SqlPager:
+    """Pages of a filtered table with LIMIT/OFFSET; counts and pages are cached by the backend."""
+
+    def __init__(self, backend, where, params, columns):
+        self.backend = backend
+        self.columns = columns
+        self._clause = where
+        self._params = params
+
+    def _where(self, search, columns):
+        if not search:
+            return self._clause, self._params
+        text = [c for c in columns if c in self.backend.text_columns]
+        if text:
+            matches = " OR ".join(f"LOWER(CAST({quote(c)} AS VARCHAR)) LIKE ? ESCAPE '\\'" for c in text)
+        else:
+            matches = "0 = 1"
+        clause = (self._clause + " AND " if self._clause else " WHERE ") + f"({matches})"
+        return clause, self._params + [_like_pattern(search)] * len(text)
+
+    def count(self, search="", columns=None):
+        clause, params = self._where(search, columns or self.columns)
+        counted = self.backend.query(f"SELECT COUNT(*) AS n FROM {quote(self.backend.table)}{clause}", params)
+        return int(counted["n"].iloc[0])
+
+    def page(self, number, size, columns=None, sort_by=None, ascending=True, search=""):
+        columns = columns or self.columns
+        clause, params = self._where(search, columns)
+        # rowid breaks ties, so pages neither overlap nor skip rows
+        order = "rowid" if sort_by is None else f"{quote(sort_by)} {'ASC' if ascending else 'DESC'} NULLS LAST, rowid"
+        rows = self.backend.query(
+            f"SELECT {', '.join(quote(c) for c in columns)} FROM {quote(self.backend.table)}{clause}"
+            f" ORDER BY {order} LIMIT {int(size)} OFFSET {int(number) * int(size)}",
+            params,
+        )
+        return parse_dates(rows.copy())
+
+
+def open_database(path, table=DEFAULT_TABLE):
+    """The ``SqlBackend`` for ``table`` in ``path``, reopened only when the file changes."""
+    return _backends.get_or_create((path_key(path), table), lambda: SqlBackend(path, table))
+
+
+def can_stream(name):
+    """Whether the file ``name`` can be streamed into a database: a CSV, with duckdb installed."""
+    return duckdb is not None and name.lower().endswith(".csv")
+
+
+def stream_database(source, path, table=DEFAULT_TABLE, chunk_rows=ingest.DEFAULT_CHUNK_ROWS, progress=None):
+    """Stream the CSV ``source`` into ``table`` of a new DuckDB file ``path``, one chunk at a time.
+
+    Returns the ``IngestSummary`` of the whole file, without cube cells:
+    the panels of the database are computed by DuckDB.
+    """
+    def write(chunks):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with duckdb.connect(tmp_path, config={"memory_limit": DUCKDB_MEMORY_LIMIT}) as connection:
+                statement = f"CREATE TABLE {quote(table)} AS SELECT * FROM chunk"
+                for chunk in chunks:
+                    connection.register("chunk", chunk)
+                    connection.execute(statement)
+                    connection.unregister("chunk")
+                    statement = f"INSERT INTO {quote(table)} SELECT * FROM chunk"
+            os.replace(tmp_path, path)
+        except BaseException:
+            for leftover in (tmp_path, tmp_path + ".wal"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+        storage.prune()
+
+    return ingest.stream(source, write, chunk_rows, progress, cells=False)
+
+
+def _stream(key, open_source, chunk_rows, progress, table):
+    path = storage.cache_path(key, ".duckdb")
+    # one session streams a file while others asking for it wait for the database
+    with _streams.lock(path):
+        if not os.path.exists(path):
+            with profiling.stage("stream csv") as record:
+                summary = stream_database(open_source(), path, table, chunk_rows, progress)
+                record.rows_out = summary.rows
+            _summaries.put(path, summary)
+        else:
+            # mark the file as recently used so pruning keeps it
+            os.utime(path)
+    return open_database(path, table)
+
+
+def stream_path(path, chunk_rows=ingest.DEFAULT_CHUNK_ROWS, progress=None, table=DEFAULT_TABLE):
+    """The ``SqlBackend`` over the CSV file ``path`` streamed into a cached DuckDB file."""
+    return _stream(path_key(path), lambda: path, chunk_rows, progress, table)
+
+
+def stream_upload(uploaded_file, chunk_rows=ingest.DEFAULT_CHUNK_ROWS, progress=None, table=DEFAULT_TABLE):
+    """The ``SqlBackend`` over an uploaded CSV streamed into a cached DuckDB file."""
+    with uploaded_file.getbuffer() as data:
+        key = upload_key(uploaded_file.name, data)
+
+    def open_source():
+        uploaded_file.seek(0)
+        return uploaded_file
+
+    return _stream(key, open_source, chunk_rows, progress, table)
+
+
+def stream_summary(backend):
+    """The ``IngestSummary`` of a database this process streamed, or None."""
+    return _summaries.get(backend.path)
+
+
+def write_database(df, path, table=DEFAULT_TABLE):
+    """Write a loaded frame to a DuckDB or SQLite file (by extension), sorted by Order Date.
+
+    Rows sorted by date let DuckDB skip row groups outside the date window;
+    SQLite gets an index on Order Date instead.
+    """
+    df = df.astype({c: "str" for c in CATEGORICAL_COLUMNS if c in df.columns})
+    if path.lower().endswith((".sqlite", ".sqlite3", ".db")):
+        with sqlite3.connect(path) as connection:
+            df.to_sql(table, connection, if_exists="replace", index=False)
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {quote(table + '_order_date')}"
+                               f" ON {quote(table)} ({quote('Order Date')})")
+        connection.close()
+        return
+    if duckdb is None:
+        raise ValueError("Writing a DuckDB database needs the duckdb package.")
+    with duckdb.connect(path) as connection:
+        connection.register("frame", df)
+        connection.execute(f"CREATE OR REPLACE TABLE {quote(table)} AS SELECT * FROM frame"
+                           f" ORDER BY {quote('Order Date')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a Superstore CSV or Excel export to a database file.")
+    parser.add_argument("source", help="CSV or Excel file")
+    parser.add_argument("database", help="output .duckdb, .sqlite or .db file")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    args = parser.parse_args()
+    write_database(load_path(args.source), args.database, args.table)
+    print(f"Wrote table {args.table!r} to {args.database}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""On-disk columnar cache of parsed datasets.
+
+A CSV or Excel source is converted once into an uncompressed Arrow IPC file
+in ``CACHE_DIR``. Later loads, including after a server restart, memory-map
+that file and read back only the requested columns instead of parsing text
+again. pyarrow is optional: without it the loader simply parses the source.
+"""
+import hashlib
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+CACHE_DIR = os.environ.get(
+    "SUPERSTORE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".superstore_cache"),
+)
+# bump when the typed layout produced by the loader changes, so stale files are ignored
+CACHE_VERSION = 3
+MAX_CACHE_FILES = 16
+# suffixes of the files ``cache_path`` hands out: Arrow files, and DuckDB files of streamed CSVs
+CACHE_SUFFIXES = (".arrow", ".duckdb")
+
+
+def available():
+    return pa is not None
+
+
+def cache_path(key, suffix=".arrow"):
+    """Location of the columnar file (or, with ``suffix=".duckdb"``, the database) for a source cache key."""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}:{key}".encode("utf-8")).hexdigest()[:32]
+    return os.path.join(CACHE_DIR, digest + suffix)
+
+
+def write_arrow(df, path):
+    """Write ``df`` as an Arrow IPC file, atomically replacing any previous file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    prune()
+
+
+def write_chunks(chunks, path, schema=None):
+    """Write the DataFrames ``chunks`` one by one as an Arrow IPC file, atomically.
+
+    Every chunk is cast to ``schema``, or to the schema of the first chunk,
+    so files written in pieces (and later parts of the same dataset) have
+    one schema. Returns the number of rows and the schema; without rows no
+    file is written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    rows = 0
+    writer = None
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            for chunk in chunks:
+                # without pandas metadata the nullable read dtypes come back as plain numpy dtypes
+                table = pa.Table.from_pandas(chunk, preserve_index=False).replace_schema_metadata(None)
+                if schema is None:
+                    schema = table.schema
+                if writer is None:
+                    writer = ipc.new_file(sink, schema)
+                writer.write_table(table.cast(schema))
+                rows += len(chunk)
+            if writer is not None:
+                writer.close()
+        if rows:
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows, schema
+
+
+def read_schema(path):
+    return ipc.open_file(path).schema
+
+
+def _read_table(path, columns):
+    table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table
+
+
+def read_arrow(path, columns=None):
+    """Memory-map an Arrow IPC file and return the requested columns as a DataFrame."""
+    table = _read_table(path, columns)
+    # mark the file as recently used so pruning keeps it
+    os.utime(path)
+    return table.to_pandas(split_blocks=True)
+
+
+def read_parts(paths, columns=None):
+    """Like ``read_arrow``, for the rows of several files with the same schema."""
+    return pa.concat_tables([_read_table(path, columns) for path in paths]).to_pandas(split_blocks=True)
+
+
+def prune(max_files=MAX_CACHE_FILES):
+    """Delete the least recently used cache files beyond ``max_files``."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    paths = [os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR) if name.endswith(CACHE_SUFFIXES)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[max_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,18 @@
+"""Batch report pages."""
+import pandas as pd
+
+from superstore import analytics
+from superstore.backend import FrameBackend
+from superstore.batch import parse_spec, report_html
+from superstore.loader import DEFAULT_DATASET, prepare_frame
+from superstore.schema import CSV_ENCODING
+
+
+def test_report_html_escapes_spec_text():
+    backend = FrameBackend(prepare_frame(pd.read_csv(DEFAULT_DATASET, encoding=CSV_ENCODING)))
+    spec = parse_spec({"name": "<script>alert(1)</script>", "month": "2017-03", "City": ["<b>&"]}, 0)
+    tables = analytics.report(backend, spec.start, spec.end, spec.selections)
+    page = report_html(spec, spec.start, spec.end, tables)
+    assert "<script>alert" not in page and "<b>&" not in page
+    assert "<title>&lt;script&gt;alert(1)&lt;/script&gt;</title>" in page
+    assert "City: &lt;b&gt;&amp;" in page
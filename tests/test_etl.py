@@ -0,0 +1,101 @@
+"""Incremental refreshes of the cleaned store against cleaning the whole raw file."""
+import os
+
+import pandas as pd
+import pytest
+
+from superstore import etl, storage
+from superstore.schema import CSV_ENCODING
+
+pytestmark = pytest.mark.skipif(not storage.available(), reason="the cleaned store needs pyarrow")
+
+
+@pytest.fixture(scope="module")
+def lines():
+    with open(etl.RAW_DATASET, "rb") as handle:
+        return handle.read().splitlines(keepends=True)
+
+
+@pytest.fixture
+def raw(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "CACHE_DIR", str(tmp_path / "cache"))
+    return str(tmp_path / "raw.csv")
+
+
+def _write(raw, lines, mode="wb"):
+    with open(raw, mode) as handle:
+        handle.writelines(lines)
+
+
+def _store(raw, watermark):
+    return etl._read_parts(etl.store_dir(raw), watermark["parts"])
+
+
+def _assert_store_is_clean(raw, watermark):
+    """The store holds the rows of cleaning the whole raw file, each once."""
+    expected = etl.clean(pd.read_csv(raw, encoding=CSV_ENCODING)).drop_duplicates("Row ID")
+    stored = _store(raw, watermark)
+    assert watermark["rows"] == len(stored) == len(expected)
+    pd.testing.assert_frame_equal(
+        stored.sort_values("Row ID", ignore_index=True).astype(object),
+        expected.sort_values("Row ID", ignore_index=True).astype(object),
+    )
+
+
+def test_append_adds_a_part(raw, lines):
+    _write(raw, lines[:3001])
+    first = etl.refresh(raw)
+    assert (first["rows"], first["added"], len(first["parts"])) == (3000, 3000, 1)
+    assert etl.refresh(raw) == first
+
+    _write(raw, lines[3001:5001], "ab")
+    second = etl.refresh(raw, chunk_rows=700)
+    assert (second["rows"], second["added"], len(second["parts"])) == (5000, 2000, 2)
+    assert second["last_row_id"] == 5000
+    _assert_store_is_clean(raw, second)
+
+
+def test_rewritten_header_rebuilds(raw, lines):
+    _write(raw, lines[:2001])
+    etl.refresh(raw)
+    _write(raw, lines[2001:3001], "ab")
+    etl.refresh(raw)
+
+    # same columns, quoted: only the header bytes change
+    header = b",".join(b'"%s"' % name for name in lines[0].rstrip(b"\r\n").split(b",")) + b"\r\n"
+    _write(raw, [header] + lines[1:3001])
+    watermark = etl.refresh(raw)
+    assert (watermark["rows"], watermark["added"], watermark["parts"]) == (3000, 3000, ["part-00000.arrow"])
+    assert sorted(n for n in os.listdir(etl.store_dir(raw)) if n.startswith("part-")) == ["part-00000.arrow"]
+    _assert_store_is_clean(raw, watermark)
+
+
+def test_reappended_rows_are_skipped(raw, lines):
+    _write(raw, lines[:2001])
+    etl.refresh(raw)
+    # an export that repeats already processed rows before the new ones
+    _write(raw, lines[1501:2501], "ab")
+    watermark = etl.refresh(raw)
+    assert (watermark["rows"], watermark["added"], watermark["last_row_id"]) == (2500, 500, 2500)
+    _assert_store_is_clean(raw, watermark)
+
+    _write(raw, lines[1:101], "ab")
+    watermark = etl.refresh(raw)
+    assert (watermark["rows"], watermark["added"], len(watermark["parts"])) == (2500, 0, 2)
+
+
+def test_parts_are_merged_past_max_parts(raw, lines, monkeypatch):
+    monkeypatch.setattr(etl, "MAX_PARTS", 3)
+    _write(raw, lines[:1001])
+    etl.refresh(raw)
+    for start in range(1001, 4001, 1000):
+        _write(raw, lines[start:start + 1000], "ab")
+        watermark = etl.refresh(raw)
+    assert watermark["parts"] == ["part-00004.arrow"] and watermark["next_part"] == 5
+    assert sorted(n for n in os.listdir(etl.store_dir(raw)) if n.startswith("part-")) == watermark["parts"]
+    _assert_store_is_clean(raw, watermark)
+
+    _write(raw, lines[4001:5001], "ab")
+    watermark = etl.refresh(raw)
+    assert watermark["parts"] == ["part-00004.arrow", "part-00005.arrow"]
+    _assert_store_is_clean(raw, watermark)
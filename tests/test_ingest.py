@@ -0,0 +1,37 @@
+"""Summaries of streamed CSV files."""
+import pandas as pd
+import pytest
+
+from superstore import ingest, sql, storage
+from superstore.cube import LINES
+from superstore.loader import DEFAULT_DATASET
+from superstore.schema import CSV_ENCODING
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return pd.read_csv(DEFAULT_DATASET, encoding=CSV_ENCODING)
+
+
+def _assert_totals(summary, raw):
+    assert summary.rows == len(raw)
+    assert summary.sales == pytest.approx(raw["Sales"].sum())
+    assert summary.profit == pytest.approx(raw["Profit"].sum())
+    assert summary.orders == raw["Order ID"].nunique()
+
+
+@pytest.mark.skipif(not storage.available(), reason="streaming to Arrow needs pyarrow")
+def test_stream_csv_keeps_cube_cells(raw, tmp_path):
+    summary = ingest.stream_csv(DEFAULT_DATASET, str(tmp_path / "rows.arrow"), chunk_rows=1500)
+    _assert_totals(summary, raw)
+    assert summary.cells[LINES].sum() == len(raw)
+    assert summary.cells["Sales"].sum() == pytest.approx(raw["Sales"].sum())
+
+
+@pytest.mark.skipif(sql.duckdb is None, reason="streaming to a database needs duckdb")
+def test_stream_database_skips_cube_cells(raw, tmp_path):
+    summary = sql.stream_database(DEFAULT_DATASET, str(tmp_path / "rows.duckdb"), chunk_rows=1500)
+    _assert_totals(summary, raw)
+    assert summary._cells == []
+    with pytest.raises(ValueError):
+        summary.cells
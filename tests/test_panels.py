@@ -0,0 +1,150 @@
+"""Panel tables and KPI totals of every backend against plain pandas groupbys."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from superstore import sql
+from superstore.aggregate import DATE_PANELS, FILTERED_PANELS
+from superstore.backend import FrameBackend
+from superstore.cube import LINES
+from superstore.loader import DEFAULT_DATASET, prepare_frame
+from superstore.schema import CSV_ENCODING
+
+WINDOWS = {
+    "whole dataset": ("2014-01-01", "2017-12-31"),
+    # starts and ends inside a month, so the cube merges two partial months
+    "partial months": ("2015-03-15", "2016-07-10"),
+    "inside one month": ("2017-02-03", "2017-02-20"),
+    "single day": ("2016-11-11", "2016-11-11"),
+    "reversed": ("2016-05-01", "2015-03-01"),
+}
+SELECTIONS = {
+    "none": None,
+    "empty": {"Region": [], "State": [], "City": []},
+    "region": {"Region": ["West"]},
+    "region and state": {"Region": ["East"], "State": ["New York"]},
+    "cities": {"City": ["Seattle", "Houston"]},
+}
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return prepare_frame(pd.read_csv(DEFAULT_DATASET, encoding=CSV_ENCODING))
+
+
+@pytest.fixture(scope="module")
+def nan_frame():
+    """The bundled data with dimension and measure values missing on some lines."""
+    raw = pd.read_csv(DEFAULT_DATASET, encoding=CSV_ENCODING)
+    raw.loc[::50, "City"] = np.nan
+    raw.loc[::70, "Discount"] = np.nan
+    raw.loc[::90, "Category"] = np.nan
+    raw.loc[::110, "Ship Mode"] = np.nan
+    raw.loc[::130, "Sales"] = np.nan
+    raw.loc[::150, "Profit"] = np.nan
+    return prepare_frame(raw)
+
+
+def _open(kind, frame, tmp_path_factory):
+    if kind == "frame":
+        return FrameBackend(frame)
+    if kind == "duckdb" and sql.duckdb is None:
+        pytest.skip("duckdb is not installed")
+    path = str(tmp_path_factory.mktemp("db") / f"superstore.{kind}")
+    sql.write_database(frame, path)
+    backend = sql.SqlBackend(path)
+    assert backend.dialect == kind
+    return backend
+
+
+@pytest.fixture(scope="module", params=["frame", "duckdb", "sqlite"])
+def backend(request, frame, tmp_path_factory):
+    return _open(request.param, frame, tmp_path_factory)
+
+
+@pytest.fixture(scope="module", params=["frame", "duckdb", "sqlite"])
+def nan_backend(request, nan_frame, tmp_path_factory):
+    return _open(request.param, nan_frame, tmp_path_factory)
+
+
+def _rows(frame, start, end, selections):
+    dates = frame["Order Date"]
+    rows = frame[(dates >= start) & (dates <= end)]
+    for column, values in (selections or {}).items():
+        if values:
+            rows = rows[rows[column].isin(values)]
+    return rows
+
+
+def _expected(rows, keys, measures):
+    grouped = rows.groupby(keys, observed=True)
+    table = grouped[[m for m in measures if m != LINES]].sum()
+    if LINES in measures:
+        table[LINES] = grouped.size()
+    return table.reset_index()[keys + measures]
+
+
+def _normalized(table, keys, measures):
+    table = table[keys + measures].astype({key: str for key in keys})
+    return table.sort_values(keys, ignore_index=True).astype({m: "float64" for m in measures})
+
+
+def _assert_panels(result, rows, specs):
+    for name, (keys, measures) in specs.items():
+        expected = _normalized(_expected(rows, keys, measures), keys, measures)
+        actual = _normalized(result[name], keys, measures)
+        pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-9, obj=name)
+
+
+@pytest.mark.parametrize("window", WINDOWS.values(), ids=WINDOWS.keys())
+@pytest.mark.parametrize("selections", SELECTIONS.values(), ids=SELECTIONS.keys())
+def test_filtered_panels(backend, frame, window, selections):
+    start, end = map(pd.Timestamp, window)
+    result = backend.panels(start, end, selections)
+    _assert_panels(result, _rows(frame, start, end, selections), FILTERED_PANELS)
+
+
+@pytest.mark.parametrize("window", WINDOWS.values(), ids=WINDOWS.keys())
+def test_date_panels(backend, frame, window):
+    start, end = map(pd.Timestamp, window)
+    result = backend.panels(start, end, panels=DATE_PANELS)
+    _assert_panels(result, _rows(frame, start, end, None), DATE_PANELS)
+
+
+@pytest.mark.parametrize("window", WINDOWS.values(), ids=WINDOWS.keys())
+@pytest.mark.parametrize("selections", SELECTIONS.values(), ids=SELECTIONS.keys())
+def test_totals(backend, frame, window, selections):
+    start, end = map(pd.Timestamp, window)
+    rows = _rows(frame, start, end, selections)
+    totals = backend.totals(start, end, selections)
+    assert totals["Sales"] == pytest.approx(rows["Sales"].sum(), rel=1e-9, abs=1e-6)
+    assert totals["Profit"] == pytest.approx(rows["Profit"].sum(), rel=1e-9, abs=1e-6)
+    assert totals["Orders"] == rows["Order ID"].nunique()
+    assert totals["Lines"] == len(rows)
+
+
+def test_reversed_window_is_empty(backend):
+    result = backend.panels(pd.Timestamp("2016-05-01"), pd.Timestamp("2015-03-01"))
+    assert all(table.empty for table in result.tables.values())
+    assert np.isclose(backend.totals(pd.Timestamp("2016-05-01"), pd.Timestamp("2015-03-01"))["Sales"], 0)
+
+
+@pytest.mark.parametrize("window", [WINDOWS["whole dataset"], WINDOWS["partial months"]], ids=["whole", "partial"])
+@pytest.mark.parametrize("selections", [None, {"Region": ["West"]}], ids=["none", "region"])
+def test_missing_dimension_values(nan_backend, nan_frame, window, selections):
+    # a line missing its City still counts in the Region panel, only State/City drops it
+    start, end = map(pd.Timestamp, window)
+    rows = _rows(nan_frame, start, end, selections)
+    result = nan_backend.panels(start, end, selections)
+    _assert_panels(result, rows, FILTERED_PANELS)
+    assert result["region"]["Sales"].sum() == pytest.approx(rows["Sales"].sum(), rel=1e-9)
+
+
+@pytest.mark.parametrize("window", WINDOWS.values(), ids=WINDOWS.keys())
+@pytest.mark.parametrize("selections", [None, {"Region": ["West"]}], ids=["none", "region"])
+def test_totals_skip_missing_measures(nan_backend, nan_frame, window, selections):
+    start, end = map(pd.Timestamp, window)
+    rows = _rows(nan_frame, start, end, selections)
+    totals = nan_backend.totals(start, end, selections)
+    assert totals["Sales"] == pytest.approx(rows["Sales"].sum(), rel=1e-9, abs=1e-6)
+    assert totals["Profit"] == pytest.approx(rows["Profit"].sum(), rel=1e-9, abs=1e-6)
@@ -0,0 +1,80 @@
+"""Uploaded ``.sql`` scripts may only create and fill tables of their own database."""
+import io
+import sqlite3
+
+import pytest
+
+from superstore import sql, storage
+
+# what `sqlite3 superstore.db .dump` writes
+CLI_DUMP = """PRAGMA foreign_keys=OFF;
+BEGIN TRANSACTION;
+CREATE TABLE superstore("Order Date" TEXT, "Region" TEXT, "Sales" REAL);
+INSERT INTO superstore VALUES('2017-01-03','West',12.5);
+INSERT INTO superstore VALUES('2017-02-10','East',7.25);
+CREATE INDEX "superstore_order_date" ON superstore("Order Date");
+COMMIT;
+"""
+
+
+class Upload(io.BytesIO):
+    """The parts of Streamlit's ``UploadedFile`` that ``save_upload`` uses."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+def _run(script, tmp_path):
+    path = str(tmp_path / "upload.sqlite")
+    sql.run_script(script, path)
+    return path
+
+
+def test_cli_dump_is_accepted(tmp_path):
+    backend = sql.SqlBackend(_run(CLI_DUMP, tmp_path))
+    assert backend.totals(backend.first, backend.last)["Sales"] == pytest.approx(19.75)
+
+
+def test_iterdump_output_is_accepted(tmp_path):
+    source = sqlite3.connect(":memory:")
+    source.executescript(CLI_DUMP)
+    path = _run("\n".join(source.iterdump()), tmp_path)
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM superstore").fetchone() == (2,)
+    connection.close()
+
+
+@pytest.mark.parametrize("script", [
+    "ATTACH DATABASE '{planted}' AS other; CREATE TABLE other.t(a);",
+    "CREATE TABLE t(a); VACUUM INTO '{planted}';",
+], ids=["attach", "vacuum into"])
+def test_writing_other_files_is_denied(tmp_path, script):
+    planted = tmp_path / "planted.db"
+    with pytest.raises(ValueError):
+        _run(script.format(planted=planted), tmp_path)
+    assert not planted.exists()
+
+
+@pytest.mark.parametrize("script", [
+    "CREATE TEMP TABLE t(a);",
+    "CREATE TABLE t(a); CREATE TRIGGER tr AFTER INSERT ON t BEGIN INSERT INTO t VALUES (1); END;",
+    "CREATE TABLE t(a); CREATE VIEW v AS SELECT * FROM t;",
+    "PRAGMA writable_schema=1;",
+    "PRAGMA main.foreign_keys=OFF;",
+    "SELECT load_extension('x');",
+    "CREATE TABLE t(a); INSERT INTO t VALUES (1); DELETE FROM t;",
+    "CREATE TABLE t(a); UPDATE sqlite_master SET sql = 'x';",
+], ids=["temp table", "trigger", "view", "pragma", "schema pragma", "load_extension", "delete", "schema update"])
+def test_other_statements_are_denied(tmp_path, script):
+    with pytest.raises(ValueError):
+        _run(script, tmp_path)
+
+
+def test_denied_upload_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "CACHE_DIR", str(tmp_path))
+    with pytest.raises(ValueError):
+        sql.save_upload(Upload("bad.sql", b"CREATE TEMP TABLE t(a);"))
+    assert list(tmp_path.iterdir()) == []
+    path = sql.save_upload(Upload("dump.sql", CLI_DUMP.encode()))
+    assert sql.dialect(path) == "sqlite"